@@ -2,13 +2,18 @@ from apiService.service_get import GetData
 from apiService.service_put import PutData
 from audio.player import AudioPlayer
 from audio.recorder import InteractiveRecorder
+from display.auto_brightness import AutoBrightness
 from display.display import DisplayModule
 from display.setting import SettingMenu
 from etc.define import *
+from etc.power import PowerPolicy
+from etc.tracing import tracer
 from openAI.conversation import OpenAIClient
+from openAI.intent import IntentMatcher
 from pvrecorder import PvRecorder
 from pico.pico import PicoVoiceTrigger
 from threading import Event
+from transmission.buttons import PRESS, RIGHT
 from transmission.serialModule import SerialModule
 
 import argparse
@@ -35,6 +40,14 @@ class VoiceAssistant:
         self.schedule = {}
         self.schedule_update_interval = 3 * 60 # run schedule every 3 minutes
         self.last_sensor_data = None
+        self.last_sensor_update = None
+        self.scheduled_conversation_flag = False
+        self.scheduler_interval = 1
+        self.scheduled_text_initiation = "こんにちは"
+        self.reminder_prepare_lead_time = 5 * 60 # generate the reminder 5 minutes ahead
+        self.loop = None
+        self.warm_up_future = None
+        self.schedule_refresh_requested = False
         self.wake_word = "さとるさん"
         self.initialize(self.args.aiclient)
 
@@ -44,9 +57,16 @@ class VoiceAssistant:
             self.http_put = PutData()
             self.interactive_recorder = InteractiveRecorder()
             self.serial_module = SerialModule(BautRate)
+            self.power = PowerPolicy(self.serial_module)
             self.display = DisplayModule(self.serial_module)
             self.audioPlayer = AudioPlayer(self.display)
-            self.setting_menu = SettingMenu(self.serial_module, self.audioPlayer)
+            self.setting_menu = SettingMenu(self.serial_module, self.audioPlayer,
+                                            cache_stats=lambda: self.ai_client.tts_cache.stats())
+            self.auto_brightness = AutoBrightness(self.serial_module, on_change=self.brightness_changed)
+            # Pushed button edges replace the 1.5 s button poll when the MCU supports it
+            if self.serial_module.subscribe():
+                self.serial_module.add_input_listener(self.power.observe)
+                self.serial_module.add_input_listener(self.auto_brightness.observe)
             
             if not self.serial_module.open(USBPort):
                 # FIXME: Send a failure notice post request to server later
@@ -69,6 +89,16 @@ class VoiceAssistant:
             self.cleanup()
             raise
 
+    def brightness_changed(self, level):
+        # Without a backlight the level is baked into every frame: redraw what is on
+        # screen and re-render the cached frames for the new level in the background
+        if self.serial_module.backlight_supported:
+            return
+        self.display.refresh()
+        self.display.warm_up([SpeakingGif])
+        if self.setting_menu.atlas:
+            self.setting_menu.atlas.build_in_background()
+
     def get_schedule(self):
         if not self.auth_token:
             logger.error("No authentication token available. Cannot fetch schedule.")
@@ -91,25 +121,34 @@ class VoiceAssistant:
         except Exception as e:
             logger.error(f"Failed to fetch schedule: {e}")
     
-    def set_next_schedule_check(self):
+    def set_next_schedule_check(self, reference_time=None):
         if not self.schedule:
             schedule.every(5).minutes.do(self.get_schedule)
             return
 
         now = datetime.datetime.now()
-        scheduled_time = now.replace(hour=int(self.schedule['hour']), 
-                                     minute=int(self.schedule['minute']), 
-                                     second=0, microsecond=0)
+        reference_time = reference_time or now
+        scheduled_time = reference_time.replace(hour=int(self.schedule['hour']), 
+                                                minute=int(self.schedule['minute']), 
+                                                second=0, microsecond=0)
         
-        if scheduled_time <= now:
+        if scheduled_time <= reference_time:
             scheduled_time += datetime.timedelta(days=1)
         
-        time_diff = (scheduled_time - now).total_seconds()
-        check_time = max(time_diff - 60, 60)  # Check 1 minute before schedule, but not less than 1 minute from now
+        time_diff = max((scheduled_time - now).total_seconds(), 1)
+        prepare_time = max(time_diff - self.reminder_prepare_lead_time, 1)
         
         schedule.clear('schedule_check')
-        schedule.every(check_time).seconds.do(self.trigger_scheduled_conversation).tag('schedule_check')
-        logger.info(f"Next schedule set for {check_time} seconds from now")
+        schedule.clear('schedule_prepare')
+        schedule.every(prepare_time).seconds.do(self.prepare_scheduled_conversation).tag('schedule_prepare')
+        schedule.every(time_diff).seconds.do(self.trigger_scheduled_conversation).tag('schedule_check')
+        logger.info(f"Next schedule set for {time_diff} seconds from now, prepared {prepare_time} seconds from now")
+
+    def prepare_scheduled_conversation(self):
+        # Runs on the scheduler thread; the OpenAI client lives on the event loop
+        if self.loop is not None:
+            asyncio.run_coroutine_threadsafe(self.ai_client.prepare_text(self.scheduled_text_initiation), self.loop)
+        return schedule.CancelJob
 
     def trigger_scheduled_conversation(self):
         now = datetime.datetime.now()
@@ -119,10 +158,16 @@ class VoiceAssistant:
         
         if abs((now - scheduled_time).total_seconds()) <= 60:  # Within 1 minute of scheduled time
             self.scheduled_conversation_flag = True
+            self.set_next_schedule_check(reference_time=scheduled_time)
         else:
             self.set_next_schedule_check()
+        return schedule.CancelJob
 
     def update_sensor_data(self):
+        if not self.power.telemetry_due(self.last_sensor_update):
+            return
+        self.last_sensor_update = time.monotonic()
+
         if not self.auth_token:
             logger.error("No authentication token available. Cannot update sensor data.")
             logger.info("reconnecting...")
@@ -201,22 +246,32 @@ class VoiceAssistant:
     def check_buttons(self):
         try:
             inputs = self.serial_module.get_inputs()
+            self.power.observe(inputs)
+            self.auto_brightness.observe(inputs)
             if inputs and 'result' in inputs:
                 result = inputs['result']
                 buttons = result.get('buttons', [])
 
                 if len(buttons) > 1 and buttons[1]:  # RIGHT button
-                    response = self.setting_menu.display_menu()
-                    if response:
-                        new_response = response
-                        return new_response
-                    time.sleep(0.2)
+                    self.setting_menu.open()
             return None
         except Exception as e:
             logger.error(f"Error in check_buttons: {e}")
             return None
+
+    def check_button_events(self):
+        # Push mode: drain the pushed events without an MCU round trip
+        event = self.serial_module.buttons.wait(timeout=0)
+        while event is not None:
+            if event.button == RIGHT and event.kind == PRESS:
+                self.setting_menu.open()
+                return None
+            event = self.serial_module.buttons.wait(timeout=0)
+        return None
         
     def listen_for_wake_word(self):
+        # Presses made during the conversation were not meant for the wake loop
+        self.serial_module.buttons.reset()
         self.recorder.start()
         audio_frames = []
         # stt_text = ""
@@ -227,21 +282,29 @@ class VoiceAssistant:
         detections = -1
         # self.interactive_recorder.start_stream()
 
-        self.scheduled_conversation_flag = False
-        
         try:
             while not exit_event.is_set():
-                schedule.run_pending()
-
                 if self.scheduled_conversation_flag:
+                    self.scheduled_conversation_flag = False
+                    self.power.mark_active()
                     return True, WakeWorkType.SCHEDULE
 
                 # audio_frame = self.interactive_recorder.stream.read(self.interactive_recorder.CHUNK_SIZE, exception_on_overflow=False)
                 audio_frame = self.recorder.read()
-                audio_frame_bytes = np.array(audio_frame, dtype=np.int16).tobytes()
-                audio_frames.append(audio_frame_bytes)
-
+                frame_time = time.perf_counter()
                 current_time = time.time() # timestamp
+                self.power.update()
+                if not self.power.idle and not self.setting_menu.active:
+                    # The idle dim owns the backlight until presence comes back, and the
+                    # brightness screen previews its own level while the menu is open
+                    self.auto_brightness.update()
+
+                if self.power.idle:
+                    # Calibration pauses while idle; the threshold from the last active period stays
+                    last_calibration_time = current_time
+                else:
+                    audio_frame_bytes = np.array(audio_frame, dtype=np.int16).tobytes()
+                    audio_frames.append(audio_frame_bytes)
 
                 if current_time - last_calibration_time >= calibration_interval:
                     self.interactive_recorder.calibrate_energy_threshold(audio_frames)
@@ -253,25 +316,42 @@ class VoiceAssistant:
                     audio_frames = []
                     last_calibration_time = current_time
 
-                detections = self.porcupine.process(audio_frame)
-                wake_word_triggered = detections >= 0
+                # While idle only frames above the noise floor (plus a short pre-roll) reach porcupine
+                wake_word_triggered = False
+                for frame in self.power.frames_to_process(audio_frame, self.interactive_recorder):
+                    detections = self.porcupine.process(frame)
+                    if detections >= 0:
+                        wake_word_triggered = True
+                        break
                 # wake_word_triggered = self.wake_word.lower() in stt_text.lower()
                 
                 if wake_word_triggered:
                     logger.info("Wake word detected")
+                    tracer.begin_conversation()
+                    self.setting_menu.close()
+                    self.power.mark_active()
+                    self.start_warm_up()
                     self.audioPlayer.play_audio(ResponseAudio)
+                    # From the frame that held the wake word to the acknowledgement sound
+                    tracer.record("wake", frame_time)
                     return True, WakeWorkType.TRIGGER
                 
-                if current_time - last_button_check_time >= button_check_interval:
+                res = None
+                if self.setting_menu.active:
+                    # The menu steps once per audio frame; someone is using it, so stay active
+                    self.power.mark_active()
+                    res = self.setting_menu.poll()
+                elif self.serial_module.subscribed:
+                    res = self.check_button_events()
+                elif current_time - last_button_check_time >= button_check_interval:
                     res = self.check_buttons()
-                    
-                    if res == 'exit':
-                        self.audioPlayer.play_trigger_with_logo(TriggerAudio, SeamanLogo)
-                    if res == 'clean':
-                        self.cleanup()
-                    
                     last_button_check_time = current_time
 
+                if res == 'exit':
+                    self.audioPlayer.play_trigger_with_logo(TriggerAudio, SeamanLogo)
+                if res == 'clean':
+                    self.cleanup()
+
         except Exception as e:
             logger.error(f"Error in wake word detection: {e}")
         finally:
@@ -279,17 +359,60 @@ class VoiceAssistant:
             # self.interactive_recorder.stop_stream()
         return False, None
 
+    def start_warm_up(self):
+        # Called from the wake word thread, so the warm-up overlaps the acknowledgement sound too
+        if self.loop is not None:
+            self.warm_up_future = asyncio.run_coroutine_threadsafe(self.warm_up(), self.loop)
+
+    async def wait_warm_up(self):
+        warm_up_future, self.warm_up_future = self.warm_up_future, None
+        if warm_up_future is not None:
+            await asyncio.wrap_future(warm_up_future)
+
+    async def warm_up(self):
+        # Speculative work on wake word detection, overlapped with recording
+        if not self.auth_token or not self.schedule:
+            # get_schedule changes the schedule jobs, so it runs on the scheduler's turn
+            self.schedule_refresh_requested = True
+        try:
+            await self.ai_client.warm_up()
+        except Exception as e:
+            logger.warning(f"Warm-up step failed: {e}")
+
+    def run_schedule_jobs(self):
+        # The schedule library is not thread-safe: every job run and every change to
+        # the job list goes through here, one call at a time
+        schedule.run_pending()
+        if self.schedule_refresh_requested:
+            self.schedule_refresh_requested = False
+            self.get_schedule()
+
+    async def run_scheduler(self):
+        self.loop = asyncio.get_running_loop()
+        # Schedule jobs (token refresh, schedule fetch, sensor upload) do blocking
+        # network and MCU I/O, so they run off the event loop and keep progressing
+        # while a conversation is using the audio and display hardware.
+        while not exit_event.is_set():
+            try:
+                await asyncio.to_thread(self.run_schedule_jobs)
+            except Exception as e:
+                logger.error(f"Error in scheduler: {e}")
+            await asyncio.sleep(self.scheduler_interval)
+
     async def process_conversation(self):
         conversation_active = True
         silence_count = 0
         max_silence = 2
 
         while conversation_active and not exit_event.is_set():
-            if not self.serial_port_check():
+            if not await asyncio.to_thread(self.serial_port_check):
                 break
 
-            self.display.start_listening_display(SatoruHappy)
-            frames = self.interactive_recorder.record_question(silence_duration=2, max_duration=30, audio_player=self.audioPlayer)
+            await asyncio.to_thread(self.display.start_listening_display, SatoruHappy)
+            tracer.begin_turn()
+            with tracer.span("record") as span:
+                frames = await asyncio.to_thread(self.interactive_recorder.record_question, silence_duration=2, max_duration=30, audio_player=self.audioPlayer)
+                span["audio_ms"] = round(len(frames or b'') / 2 / RATE * 1000)
 
             if not frames:
                 silence_count += 1
@@ -299,16 +422,18 @@ class VoiceAssistant:
                 continue
             else:
                 silence_count = 0
+            tracer.mark("recorded")
 
             input_audio_file = AIOutputAudio
-            self.interactive_recorder.save_audio(frames, input_audio_file)
+            with tracer.span("save_audio"):
+                await asyncio.to_thread(self.interactive_recorder.save_audio, frames, input_audio_file)
             # with wave.open(input_audio_file, 'wb') as wf:
             #     wf.setnchannels(CHANNELS)
             #     wf.setsampwidth(2)
             #     wf.setframerate(RATE)
             #     wf.writeframes(frames)
 
-            self.display.stop_listening_display()
+            await asyncio.to_thread(self.display.stop_listening_display)
 
             try:
                 conversation_ended = await self.ai_client.process_audio(input_audio_file)
@@ -316,25 +441,30 @@ class VoiceAssistant:
                     conversation_active = False
             except Exception as e:
                 logger.error(f"Error processing conversation: {e}")
-                self.audioPlayer.sync_audio_and_gif(ErrorAudio, SpeakingGif)
+                await asyncio.to_thread(self.audioPlayer.sync_audio_and_gif, ErrorAudio, SpeakingGif)
                 conversation_active = False
 
-        self.display.fade_in_logo(SeamanLogo)
+        tracer.log_summary()
+        await asyncio.to_thread(self.display.fade_in_logo, SeamanLogo)
 
     async def scheduled_conversation(self):
         conversation_active = True
         silence_count = 0
         max_silence = 2
-        text_initiation ="こんにちは"
+        text_initiation = self.scheduled_text_initiation
         input_audio_file = None
+        tracer.begin_conversation()
 
         while conversation_active and not exit_event.is_set():
-            if not self.serial_port_check():
+            if not await asyncio.to_thread(self.serial_port_check):
                 break
 
             if input_audio_file:
-                self.display.start_listening_display(SatoruHappy)
-                frames = self.interactive_recorder.record_question(silence_duration=2, max_duration=30, audio_player=self.audioPlayer)
+                await asyncio.to_thread(self.display.start_listening_display, SatoruHappy)
+                tracer.begin_turn()
+                with tracer.span("record") as span:
+                    frames = await asyncio.to_thread(self.interactive_recorder.record_question, silence_duration=2, max_duration=30, audio_player=self.audioPlayer)
+                    span["audio_ms"] = round(len(frames or b'') / 2 / RATE * 1000)
 
                 if not frames:
                     silence_count += 1
@@ -344,15 +474,17 @@ class VoiceAssistant:
                     continue
                 else:
                     silence_count = 0
+                tracer.mark("recorded")
 
-                self.interactive_recorder.save_audio(frames, input_audio_file)
+                with tracer.span("save_audio"):
+                    await asyncio.to_thread(self.interactive_recorder.save_audio, frames, input_audio_file)
                 # with wave.open(input_audio_file, 'wb') as wf:
                 #     wf.setnchannels(CHANNELS)
                 #     wf.setsampwidth(2)
                 #     wf.setframerate(RATE)
                 #     wf.writeframes(frames)
 
-                self.display.stop_listening_display()
+                await asyncio.to_thread(self.display.stop_listening_display)
 
             try:
                 if input_audio_file:
@@ -365,10 +497,11 @@ class VoiceAssistant:
                     conversation_active = False
             except Exception as e:
                 logger.error(f"Error processing conversation: {e}")
-                self.audioPlayer.sync_audio_and_gif(ErrorAudio, SpeakingGif)
+                await asyncio.to_thread(self.audioPlayer.sync_audio_and_gif, ErrorAudio, SpeakingGif)
                 conversation_active = False
 
-        self.display.fade_in_logo(SeamanLogo)
+        tracer.log_summary()
+        await asyncio.to_thread(self.display.fade_in_logo, SeamanLogo)
 
     def serial_port_check(self):
         if not self.serial_module.isPortOpen:
@@ -414,20 +547,30 @@ async def main():
     # OpenAi
     parser.add_argument('--aiclient', help='Asynchronous openAi client', default=aiClient)
 
+    # Latency tracing
+    parser.add_argument('--trace_file', help="JSON lines file for per-stage latency spans, '' to disable", default=TraceFile)
+
     args = parser.parse_args()
+    if args.trace_file:
+        tracer.open(args.trace_file)
 
     assistant = VoiceAssistant(args)
     aiClient.setAudioPlayer(assistant.audioPlayer)
+    aiClient.setIntentMatcher(IntentMatcher(assistant.audioPlayer, assistant.serial_module))
+    intent_warm_up_task = asyncio.create_task(aiClient.warm_intent_replies())
+
+    scheduler_task = asyncio.create_task(assistant.run_scheduler())
 
     try:
-        assistant.audioPlayer.play_trigger_with_logo(TriggerAudio, SeamanLogo)
+        await asyncio.to_thread(assistant.audioPlayer.play_trigger_with_logo, TriggerAudio, SeamanLogo)
 
         while not exit_event.is_set():
             try:
-                res, trigger_type = assistant.listen_for_wake_word()
+                res, trigger_type = await asyncio.to_thread(assistant.listen_for_wake_word)
                 if res:
                     if trigger_type == WakeWorkType.TRIGGER:
                         await assistant.process_conversation()
+                        await assistant.wait_warm_up()
                     if trigger_type == WakeWorkType.SCHEDULE:
                         await assistant.scheduled_conversation()
                 else:
@@ -441,8 +584,13 @@ async def main():
     except Exception as e:
         logger.error(f"An unexpected error occurred: {e}", exc_info=True)
     finally:
+        for task in (intent_warm_up_task, scheduler_task):
+            task.cancel()
+        await asyncio.gather(intent_warm_up_task, scheduler_task, return_exceptions=True)
         await assistant.ai_client.close()
         assistant.cleanup()
+        tracer.log_summary()
+        tracer.close()
         
 if __name__ == '__main__':
     signal.signal(signal.SIGTERM, signal_handler)
@@ -1,10 +1,12 @@
 from contextlib import contextmanager
+from etc.tracing import tracer
 from pygame import mixer
 
 import os
 import pygame
 import sys
 import threading
+import time
 
 @contextmanager
 def suppress_stdout_stderr():
@@ -53,15 +55,20 @@ class AudioPlayer:
         fade_thread.join()
 
     def sync_audio_and_gif(self, audio_file, gif_path):
+        start = time.perf_counter()
         self.play_audio(audio_file)
+        tracer.record("playback.start", start)
+        # What the user waits for: end of their question to the first reply audio
+        tracer.since("recorded", "first_audio")
         
-        gif_thread = threading.Thread(target=self.display.update_gif, args=(gif_path,))
+        gif_thread = threading.Thread(target=self.display.update_gif, args=(gif_path, audio_file))
         gif_thread.start()
 
         clock = pygame.time.Clock()
         while mixer.music.get_busy():
             with suppress_stdout_stderr():
                 clock.tick(10)
+        tracer.record("playback", start)
 
         gif_thread.join()
         self.display.send_white_frames()
\ No newline at end of file
@@ -32,6 +32,8 @@ class InteractiveRecorder:
         self.CHUNKS_PER_SECOND = 1000 // self.CHUNK_DURATION_MS
         self.energy_threshold = None
         self.silence_energy = None
+        # The energy filter is designed once; frame_energy runs on every idle wake word frame
+        self.energy_filter = self.butter_lowpass(cutoff=1000, fs=RATE)
 
         with suppress_stdout_stderr():
             self.p = pyaudio.PyAudio()
@@ -70,13 +72,16 @@ class InteractiveRecorder:
         y = lfilter(b, a, data)
         return y
 
+    def frame_energy(self, audio_chunk):
+        # Energy below 1 kHz, the scale silence_energy and energy_threshold are on
+        filtered_audio = lfilter(*self.energy_filter, audio_chunk)
+        return np.sum(filtered_audio**2) / len(filtered_audio)
+
     def calibrate_energy_threshold(self, audio_frames):
         energy_levels = []
         for frame in audio_frames:
             audio_chunk = np.frombuffer(frame, dtype=np.int16)
-            filtered_audio = self.butter_lowpass_filter(audio_chunk, cutoff=1000, fs=RATE)
-            energy = np.sum(filtered_audio**2) / len(filtered_audio)
-            energy_levels.append(energy)
+            energy_levels.append(self.frame_energy(audio_chunk))
         
         self.silence_energy = np.mean(energy_levels)
         self.energy_threshold = self.silence_energy * 4
@@ -86,9 +91,7 @@ class InteractiveRecorder:
         if self.energy_threshold is None:
             return False
         audio_chunk = np.frombuffer(audio_frame, dtype=np.int16)
-        filtered_audio = self.butter_lowpass_filter(audio_chunk, cutoff=1000, fs=RATE)
-        energy = np.sum(filtered_audio**2) / len(filtered_audio)
-        return energy > self.energy_threshold
+        return self.frame_energy(audio_chunk) > self.energy_threshold
 
     def record_question(self, silence_duration, max_duration, audio_player):
         self.start_stream()
@@ -0,0 +1,195 @@
+from etc.define import logger
+from PIL import Image, ImageDraw, ImageFont
+
+import math
+
+FONT_PATHS = [
+    "/usr/share/fonts/truetype/noto/NotoSansCJK-Bold.ttc",
+    "/usr/share/fonts/opentype/ipafont-gothic/ipag.ttf",
+    "/usr/share/fonts/truetype/liberation/LiberationSans-Regular.ttf",
+    "/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf"
+]
+
+def draw_icon(draw, icon, position, size=24, icon_color=(255, 255, 255), background_color=(73, 80, 87)):
+    x, y = position
+
+    if icon == 'volume':
+        # Volume icon
+        icon_width = size * 0.9
+        icon_height = size * 0.9
+        speaker_width = icon_width * 0.4
+        speaker_height = icon_height * 0.6
+
+        # Calculate positions
+        speaker_x = x + (size - speaker_width) // 2
+        speaker_y = y + (size - speaker_height) // 2
+
+        # Draw the speaker part
+        draw.polygon([
+            (speaker_x, speaker_y + speaker_height * 0.3),
+            (speaker_x + speaker_width * 0.6, speaker_y + speaker_height * 0.3),
+            (speaker_x + speaker_width, speaker_y),
+            (speaker_x + speaker_width, speaker_y + speaker_height),
+            (speaker_x + speaker_width * 0.6, speaker_y + speaker_height * 0.7),
+            (speaker_x, speaker_y + speaker_height * 0.7)
+        ], fill=icon_color)
+
+        # Draw the three arcs
+        arc_center_x = x + size * 0.7
+        arc_center_y = y + size // 2
+        for i in range(3):
+            arc_radius = size * (0.15 + i * 0.1)
+            arc_bbox = [
+                arc_center_x - arc_radius,
+                arc_center_y - arc_radius,
+                arc_center_x + arc_radius,
+                arc_center_y + arc_radius
+            ]
+            draw.arc(arc_bbox, start=300, end=60, fill=icon_color, width=2)
+
+    elif icon == 'brightness':
+        # Half-filled sun icon
+        center = size // 2
+
+        # Draw the full circle outline
+        draw.ellipse([x+size*0.17, y+size*0.17, x+size*0.83, y+size*0.83], outline=icon_color, width=2)
+
+        # Fill the left half of the circle
+        draw.pieslice([x+size*0.17, y+size*0.17, x+size*0.83, y+size*0.83], start=90, end=270, fill=icon_color)
+
+        # Draw the rays
+        for i in range(8):
+            angle = i * 45
+            x1 = x + center + int(size*0.58 * math.cos(math.radians(angle)))
+            y1 = y + center + int(size*0.58 * math.sin(math.radians(angle)))
+            x2 = x + center + int(size*0.42 * math.cos(math.radians(angle)))
+            y2 = y + center + int(size*0.42 * math.sin(math.radians(angle)))
+            draw.line([x1, y1, x2, y2], fill=icon_color, width=2)
+
+    elif icon == 'character':
+        # Smiling face icon
+        padding = size * 0.1
+        center_x = x + size // 2
+        center_y = y + size // 2
+        face_radius = (size - 2 * padding) // 2
+
+        # Draw the face outline
+        draw.ellipse([x + padding, y + padding, x + size - padding, y + size - padding], outline=icon_color, width=2)
+
+        # Draw eyes
+        eye_radius = size * 0.06
+        eye_offset = face_radius * 0.35
+        left_eye_center = (center_x - eye_offset, center_y - eye_offset)
+        right_eye_center = (center_x + eye_offset, center_y - eye_offset)
+        draw.ellipse([left_eye_center[0] - eye_radius, left_eye_center[1] - eye_radius,
+                      left_eye_center[0] + eye_radius, left_eye_center[1] + eye_radius], fill=icon_color)
+        draw.ellipse([right_eye_center[0] - eye_radius, right_eye_center[1] - eye_radius,
+                      right_eye_center[0] + eye_radius, right_eye_center[1] + eye_radius], fill=icon_color)
+
+        # Draw a smile
+        smile_y = center_y + face_radius * 0.1
+        smile_width = face_radius * 0.9
+        smile_height = face_radius * 0.7
+        smile_bbox = [center_x - smile_width/2, smile_y - smile_height/2,
+                      center_x + smile_width/2, smile_y + smile_height/2]
+        draw.arc(smile_bbox, start=0, end=180, fill=icon_color, width=2)
+
+    elif icon == 'settings':
+        # Solid gear icon with square teeth
+        center = size // 2
+        outer_radius = size * 0.45
+        num_teeth = 8
+        tooth_depth = size * 0.15
+        tooth_width = size * 0.12
+
+        # Create a list to hold the points of the gear
+        gear_shape = []
+
+        for i in range(num_teeth * 2):
+            angle = i * (360 / (num_teeth * 2))
+            if i % 2 == 0:
+                # Outer points (teeth)
+                x1 = x + center + outer_radius * math.cos(math.radians(angle - 360/(num_teeth*4)))
+                y1 = y + center + outer_radius * math.sin(math.radians(angle - 360/(num_teeth*4)))
+                x2 = x + center + outer_radius * math.cos(math.radians(angle + 360/(num_teeth*4)))
+                y2 = y + center + outer_radius * math.sin(math.radians(angle + 360/(num_teeth*4)))
+                gear_shape.extend([(x1, y1), (x2, y2)])
+            else:
+                # Inner points (between teeth)
+                x1 = x + center + (outer_radius - tooth_depth) * math.cos(math.radians(angle - tooth_width))
+                y1 = y + center + (outer_radius - tooth_depth) * math.sin(math.radians(angle - tooth_width))
+                x2 = x + center + (outer_radius - tooth_depth) * math.cos(math.radians(angle + tooth_width))
+                y2 = y + center + (outer_radius - tooth_depth) * math.sin(math.radians(angle + tooth_width))
+                gear_shape.extend([(x1, y1), (x2, y2)])
+
+        # Draw the gear as a single polygon
+        draw.polygon(gear_shape, fill=icon_color)
+
+        # Draw a small circle in the center
+        center_radius = size * 0.15
+        draw.ellipse([x + center - center_radius, y + center - center_radius,
+                      x + center + center_radius, y + center + center_radius],
+                     fill=background_color)
+
+    elif icon == 'exit':
+        # X icon
+        draw.line([x+size*0.17, y+size*0.17, x+size*0.83, y+size*0.83], fill=icon_color, width=3)
+        draw.line([x+size*0.17, y+size*0.83, x+size*0.83, y+size*0.17], fill=icon_color, width=3)
+
+class UIAssets:
+    # Fonts, icons and the static chrome shared by the setting screens. Everything is
+    # built once and reused, so a redraw only pays for what actually changed.
+    def __init__(self, background_color=(73, 80, 87), text_color=(255, 255, 255), icon_size=24):
+        self.background_color = background_color
+        self.text_color = text_color
+        self.icon_size = icon_size
+        self.font_path = self.find_font_path()
+        self.fonts = {}
+        self.icons = {}
+
+    def find_font_path(self):
+        for font_path in FONT_PATHS:
+            try:
+                ImageFont.truetype(font_path, 12)
+                return font_path
+            except IOError:
+                logger.warning(f"Could not load font: {font_path}")
+
+        logger.error("Could not load any fonts. Using default font.")
+        return None
+
+    def font(self, size):
+        font = self.fonts.get(size)
+        if font is None:
+            if self.font_path:
+                font = ImageFont.truetype(self.font_path, size)
+            else:
+                font = ImageFont.load_default(size)
+            self.fonts[size] = font
+        return font
+
+    def icon(self, name, icon_color=None):
+        # Rasterised on a padded transparent tile; the rays and arcs reach past the icon box.
+        # The primitives are not anti-aliased, so pasting through the alpha is pixel exact.
+        icon_color = icon_color or self.text_color
+        key = (name, icon_color)
+        layer = self.icons.get(key)
+        if layer is None:
+            pad = self.icon_size // 2
+            tile = self.icon_size + 2 * pad
+            layer = Image.new('RGBA', (tile, tile), (0, 0, 0, 0))
+            draw_icon(ImageDraw.Draw(layer), name, (pad, pad), self.icon_size,
+                      icon_color=icon_color + (255,), background_color=self.background_color + (255,))
+            self.icons[key] = layer
+        return layer
+
+    def paste_icon(self, image, name, position, icon_color=None):
+        layer = self.icon(name, icon_color)
+        pad = self.icon_size // 2
+        image.paste(layer, (int(position[0]) - pad, int(position[1]) - pad), layer)
+
+    def draw_navigation(self, draw):
+        draw.polygon([(20, 120), (30, 110), (30, 130)], fill=self.text_color)  # Left arrow
+        draw.polygon([(220, 120), (210, 110), (210, 130)], fill=self.text_color)  # Right arrow
+        draw.text((20, 135), "戻る", font=self.font(12), fill=self.text_color)
+        draw.text((200, 135), "決定", font=self.font(12), fill=self.text_color)
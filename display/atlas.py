@@ -0,0 +1,93 @@
+from collections import OrderedDict
+from display.worker import PRIORITY_LOW
+from etc.define import logger
+
+import threading
+
+LEVEL_STEPS = 20
+
+def level_step(level, steps=LEVEL_STEPS):
+    # Slider levels move in 1/steps increments; anything off that grid is rendered live
+    step = round(level * steps)
+    if abs(level * steps - step) > 1e-6:
+        return None
+    return step
+
+def step_level(step, steps=LEVEL_STEPS):
+    return round(step / steps, 2)
+
+class FrameAtlas:
+    # Encoded frames for every state of the setting screens. Each screen registers a
+    # renderer and its states; a frame is rendered at most once per brightness and
+    # navigation afterwards only sends the stored buffer.
+    def __init__(self, serial_module, max_generations=3):
+        self.serial_module = serial_module
+        # A few recent brightness levels are kept, so moving back to one costs nothing
+        self.max_generations = max_generations
+        self.renderers = {}
+        self.frames = {}
+        self.hits = 0
+        self.misses = 0
+        # Frames are rendered on the wake word loop and on the display worker
+        self.lock = threading.RLock()
+
+    def register(self, screen, render, states, follows_brightness=True):
+        self.renderers[screen] = (render, list(states), follows_brightness)
+
+    def generation(self, screen):
+        # Frames that bake in the software brightness go stale when it changes
+        follows_brightness = self.renderers[screen][2]
+        return self.serial_module.software_brightness if follows_brightness else None
+
+    def screen_frames(self, screen):
+        generation = self.generation(screen)
+        generations = self.frames.setdefault(screen, OrderedDict())
+        frames = generations.get(generation)
+        if frames is None:
+            frames = generations[generation] = {}
+            while len(generations) > self.max_generations:
+                generations.popitem(last=False)
+        else:
+            generations.move_to_end(generation)
+        return frames
+
+    def frame(self, screen, state):
+        with self.lock:
+            frames = self.screen_frames(screen)
+            data = frames.get(state)
+            if data is None:
+                self.misses += 1
+                data = frames[state] = self.renderers[screen][0](state)
+            else:
+                self.hits += 1
+            return data
+
+    def build_next(self):
+        """Renders one missing frame, so the atlas can fill up while a screen is idle."""
+        with self.lock:
+            for screen, (render, states, _) in self.renderers.items():
+                frames = self.screen_frames(screen)
+                for state in states:
+                    if state not in frames:
+                        frames[state] = render(state)
+                        return True
+            return False
+
+    def build_in_background(self):
+        # One frame per display worker job, so animation frames are never held up for long
+        def build_step():
+            if self.build_next():
+                self.serial_module.display_worker.call(build_step, priority=PRIORITY_LOW, wait=False)
+        self.serial_module.display_worker.call(build_step, priority=PRIORITY_LOW, wait=False)
+
+    def build(self):
+        count = 0
+        while self.build_next():
+            count += 1
+        if count:
+            logger.info(f"Frame atlas: rendered {count} frames")
+        return count
+
+    def stats(self):
+        frames = [data for generations in self.frames.values() for screen in generations.values() for data in screen.values()]
+        return {'frames': len(frames), 'bytes': sum(len(data) for data in frames), 'hits': self.hits, 'misses': self.misses}
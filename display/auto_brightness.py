@@ -0,0 +1,73 @@
+from display.atlas import LEVEL_STEPS, step_level
+from etc.define import logger
+
+import math
+import time
+
+class AutoBrightness:
+    # Follows the ambient light sensor. Lux is smoothed with an EMA and mapped on a
+    # log curve to a level on the 0.05 slider grid, so every level it picks has
+    # frames in the atlas. A new level needs to clear the current one by a
+    # hysteresis margin, and changes are at least min_interval seconds apart.
+    #
+    # observe() only does arithmetic and may run on the MCU reader thread; update()
+    # applies the level and runs on the wake word loop. A brightness set by someone
+    # else (the settings screen, a voice command) pauses it for manual_hold seconds
+    # from the moment it was set. on_change(level) runs after every change it makes.
+    def __init__(self, serial_module, min_level=0.2, max_level=1.0, lux_max=1000.0, smoothing=0.2,
+                 hysteresis=0.25, min_interval=10.0, manual_hold=30 * 60, on_change=None):
+        self.serial_module = serial_module
+        self.on_change = on_change
+        self.min_level = min_level
+        self.max_level = max_level
+        self.lux_max = lux_max
+        self.smoothing = smoothing
+        self.hysteresis = hysteresis
+        self.min_interval = min_interval
+        self.manual_hold = manual_hold
+        self.enabled = True
+        self.lux = None
+        self.target = None
+        self.applied_level = serial_module.current_brightness
+        self.last_change = 0.0
+        self.hold_until = 0.0
+        self.changes = 0
+
+    def level_for(self, lux):
+        position = math.log10(1 + max(0.0, lux)) / math.log10(1 + self.lux_max)
+        return self.min_level + (self.max_level - self.min_level) * min(1.0, position)
+
+    def observe(self, inputs):
+        if not inputs or 'result' not in inputs or 'luminosity' not in inputs['result']:
+            return
+        lux = float(inputs['result']['luminosity'])
+        self.lux = lux if self.lux is None else self.lux + self.smoothing * (lux - self.lux)
+
+        level = self.level_for(self.lux)
+        # Stay put until the curve is clearly past the current grid step
+        if abs(level - self.applied_level) < (0.5 + self.hysteresis) / LEVEL_STEPS:
+            self.target = None
+        else:
+            self.target = step_level(round(level * LEVEL_STEPS))
+
+    def update(self, now=None):
+        if not self.enabled or self.target is None:
+            return False
+        now = time.monotonic() if now is None else now
+
+        if self.serial_module.current_brightness != self.applied_level:
+            logger.info(f"Brightness set to {self.serial_module.current_brightness:.2f} by hand, auto brightness paused")
+            self.applied_level = self.serial_module.current_brightness
+            self.hold_until = self.serial_module.brightness_changed_at + self.manual_hold
+        if now < self.hold_until or now - self.last_change < self.min_interval:
+            return False
+
+        level, self.target = self.target, None
+        self.serial_module.set_brightness(level)
+        self.applied_level = self.serial_module.current_brightness
+        self.last_change = now
+        self.changes += 1
+        logger.info(f"Auto brightness: {self.lux:.0f} lux -> {level:.2f}")
+        if self.on_change:
+            self.on_change(level)
+        return True
@@ -0,0 +1,45 @@
+from display.widgets import Icon, Label, Screen
+from transmission.buttons import LEFT, RELEASE, RIGHT
+
+class SettingCacheStats:
+    # Read-only screen under 設定 with the TTS cache counters. The values change
+    # with every reply, so the frame is rendered on entry instead of coming from
+    # the atlas. stats is a callable returning TTSCache.stats().
+    def __init__(self, serial_module, stats, assets):
+        self.serial_module = serial_module
+        self.stats = stats
+        self.text_color = (255, 255, 255)
+        self.display_size = (240, 240)
+        self.assets = assets
+
+        icon_size = 24
+        center = self.display_size[0] // 2
+        font = self.assets.font(14)
+        self.screen = Screen(self.assets, self.display_size, self.assets.background_color)
+        self.screen.add(Icon((center - icon_size // 2, 20), 'settings', self.assets))
+        self.screen.add(Label((center, 20 + icon_size + 5), "音声キャッシュ", font, self.text_color, align='center'))
+        self.lines = [self.screen.add(Label((center, 90 + 28 * row), "", font, self.text_color, align='center'))
+                      for row in range(4)]
+
+    def update_display(self):
+        stats = self.stats() if self.stats else None
+        if stats:
+            texts = [f"ヒット {stats['hits']} / ミス {stats['misses']}",
+                     f"ヒット率 {stats['hit_rate'] * 100:.0f}%",
+                     f"{stats['entries']} 件",
+                     f"{stats['bytes'] / (1024 * 1024):.1f} MB"]
+        else:
+            texts = ["キャッシュなし", "", "", ""]
+        for line, text in zip(self.lines, texts):
+            line.text = text
+        image = self.serial_module.apply_brightness(self.screen.render())
+        self.serial_module.send_image_data(self.screen.encode(image))
+
+    def enter(self):
+        self.update_display()
+
+    def handle_event(self, event):
+        """Returns ('back', None) once the screen is left, None while it stays open."""
+        if event.kind != RELEASE and event.button in (LEFT, RIGHT):
+            return 'back', None
+        return None
@@ -0,0 +1,40 @@
+from PIL import Image
+
+import io
+import numpy as np
+
+def build_lut(factor):
+    # Scaling towards black, the same result as ImageEnhance.Brightness or an alpha fade over black
+    return np.clip(np.rint(np.arange(256, dtype=np.float32) * factor), 0, 255).astype(np.uint8)
+
+class ImageCompositor:
+    # Holds a source image as a uint8 array and renders brightness/fade levels into
+    # one reusable buffer through cached 256-entry lookup tables.
+    def __init__(self, image, size=None):
+        if isinstance(image, str):
+            image = Image.open(image)
+        if isinstance(image, Image.Image):
+            image = image.convert('RGB')
+            if size and image.size != size:
+                image = image.resize(size)
+            image = np.asarray(image, dtype=np.uint8)
+        self.source = np.ascontiguousarray(image, dtype=np.uint8)
+        self.buffer = np.empty_like(self.source)
+        self.luts = {}
+
+    def lut(self, factor):
+        key = round(float(factor), 3)
+        lut = self.luts.get(key)
+        if lut is None:
+            lut = self.luts[key] = build_lut(key)
+        return lut
+
+    def render(self, factor):
+        # The returned array is overwritten by the next call
+        np.take(self.lut(factor), self.source, out=self.buffer)
+        return self.buffer
+
+    def encode(self, factor, format='PNG'):
+        img_byte_arr = io.BytesIO()
+        Image.fromarray(self.render(factor)).save(img_byte_arr, format=format)
+        return img_byte_arr.getvalue()
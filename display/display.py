@@ -1,10 +1,15 @@
+from collections import OrderedDict
+from display.compositing import ImageCompositor
+from display.lipsync import LipSync
+from display.worker import PRIORITY_LOW
 from etc.define import logger
 from contextlib import contextmanager
-from PIL import Image, ImageEnhance
+from PIL import Image
 from pygame import mixer
 
 import io 
 import os
+import threading
 import time
 
 @contextmanager
@@ -25,51 +30,83 @@ class DisplayModule:
     def __init__(self, serial_module):
         self.serial_module = serial_module
         self.fade_in_steps = 7
+        self.lipsync = LipSync(frame_rate=10)
+        self.gif_cache = OrderedDict()
+        self.gif_cache_size = 3
+        self.gif_cache_lock = threading.Lock()
+        # The still image on screen, redrawn when the software brightness changes
+        self.still_image = None
 
     def fade_in_logo(self, logo_path):
-        img = Image.open(logo_path)
-        width, height = img.size
+        self.still_image = logo_path
+        compositor = ImageCompositor(logo_path)
+
+        if self.serial_module.backlight_supported:
+            # One full frame, then the fade runs on the backlight
+            self.serial_module.set_backlight(0.0)
+            self.serial_module.send_image_data(compositor.encode(1.0))
+            self.serial_module.fade_backlight(0.0, self.serial_module.current_brightness, steps=self.fade_in_steps, transition_time=0.3)
+            return
         
         for i in range(self.fade_in_steps):
-            alpha = int(255 * (i + 1) / self.fade_in_steps)
+            alpha = (i + 1) / self.fade_in_steps
             current_brightness = self.serial_module.current_brightness * (i + 1) / self.fade_in_steps
 
-            faded_img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-            faded_img.paste(img, (0, 0))
-            faded_img.putalpha(alpha)
-
-            rgb_img = Image.new("RGB", faded_img.size, (0, 0, 0))
-            rgb_img.paste(faded_img, mask=faded_img.split()[3])
-
-            enhancer = ImageEnhance.Brightness(rgb_img)
-            brightened_img = enhancer.enhance(current_brightness)
-
-            img_byte_arr = io.BytesIO()
-            brightened_img.save(img_byte_arr, format='PNG')
-            img_byte_arr = img_byte_arr.getvalue()
-
-            self.serial_module.send_image_data(img_byte_arr)
+            self.serial_module.send_image_data(compositor.encode(alpha * current_brightness))
             time.sleep(0.01)
 
-    def update_gif(self, gif_path):
-        frames = self.serial_module.prepare_gif(gif_path)
-        all_frames = self.serial_module.precompute_frames(frames)
-        
-        frame_index = 0
-        while mixer.music.get_busy():
-            frame = Image.open(io.BytesIO(all_frames[frame_index]))
-            
-            brightened_frame = self.serial_module.apply_brightness(frame)
-            
-            img_byte_arr = io.BytesIO()
-            brightened_frame.save(img_byte_arr, format='PNG')
-            img_byte_arr = img_byte_arr.getvalue()
-            
-            self.serial_module.send_image_data(img_byte_arr)
-            frame_index = (frame_index + 1) % len(all_frames)
-            time.sleep(0.1)
+    def load_gif_frames(self, gif_path):
+        # Encoded frames depend on the software brightness, so that is part of the key
+        key = (gif_path, self.serial_module.software_brightness)
+        with self.gif_cache_lock:
+            cached = self.gif_cache.get(key)
+            if cached is None:
+                frames = self.serial_module.prepare_gif(gif_path)
+                # precompute_frames already applies the current brightness
+                cached = (frames, self.serial_module.precompute_frames(frames))
+                self.gif_cache[key] = cached
+                while len(self.gif_cache) > self.gif_cache_size:
+                    self.gif_cache.popitem(last=False)
+            else:
+                self.gif_cache.move_to_end(key)
+            return cached
+
+    def refresh(self):
+        # Redraws the still image at the current software brightness
+        if self.still_image is not None:
+            self.serial_module.send_image_data(ImageCompositor(self.still_image).encode(self.serial_module.software_brightness))
+
+    def warm_up(self, gif_paths):
+        # Renders the animations for the current brightness on the display worker,
+        # so the next conversation does not pay for it before the first audio
+        for gif_path in gif_paths:
+            self.serial_module.display_worker.call(self.load_gif_frames, gif_path, priority=PRIORITY_LOW, wait=False)
+
+    def update_gif(self, gif_path, audio_file=None):
+        self.still_image = None
+        frames, all_frames = self.load_gif_frames(gif_path)
+        schedule = self.lipsync.schedule(audio_file, frames) if audio_file else None
+
+        if schedule is None:
+            frame_index = 0
+            while mixer.music.get_busy():
+                self.serial_module.send_animation_frame(all_frames[frame_index])
+                frame_index = (frame_index + 1) % len(all_frames)
+                time.sleep(0.1)
+        else:
+            tick = 1 / self.lipsync.frame_rate
+            last_index = None
+            while mixer.music.get_busy():
+                frame_index = self.lipsync.frame_at(schedule, mixer.music.get_pos())
+                # Nothing goes over the wire while the mouth shape holds
+                if frame_index is not None and frame_index != last_index:
+                    self.serial_module.send_animation_frame(all_frames[frame_index])
+                    last_index = frame_index
+                time.sleep(tick / 2)
+        self.serial_module.display_worker.clear_animation()
 
     def display_image(self, image_path):
+        self.still_image = image_path
         try:
             img = Image.open(image_path)
             width, height = img.size
@@ -0,0 +1,76 @@
+from etc.define import logger
+
+import numpy as np
+import wave
+
+class LipSync:
+    # Maps the loudness of the reply audio onto the speaking GIF. The RMS envelope is
+    # computed once per file, one value per animation tick, and each tick selects a
+    # frame ordered from closed to widest mouth by its distance from the closed frame.
+    def __init__(self, frame_rate=10, silence_threshold=0.05, levels=None):
+        self.frame_rate = frame_rate
+        self.silence_threshold = silence_threshold
+        self.levels = levels
+
+    def read_samples(self, audio_file):
+        with wave.open(audio_file, 'rb') as wf:
+            sample_rate = wf.getframerate()
+            channels = wf.getnchannels()
+            sample_width = wf.getsampwidth()
+            # Streamed TTS headers can carry a placeholder length, so read until EOF
+            data = wf.readframes(wf.getnframes() or 1 << 31)
+
+        if sample_width != 2:
+            raise ValueError(f"Unsupported sample width: {sample_width}")
+
+        samples = np.frombuffer(data[:len(data) - len(data) % (2 * channels)], dtype='<i2')
+        if channels > 1:
+            samples = samples.reshape(-1, channels).mean(axis=1)
+        return samples.astype(np.float32) / 32768.0, sample_rate
+
+    def envelope(self, audio_file):
+        samples, sample_rate = self.read_samples(audio_file)
+        hop = max(1, sample_rate // self.frame_rate)
+        ticks = -(-len(samples) // hop)
+        if ticks == 0:
+            return np.zeros(0, dtype=np.float32)
+
+        padded = np.zeros(ticks * hop, dtype=np.float32)
+        padded[:len(samples)] = samples
+        rms = np.sqrt(np.mean(np.square(padded.reshape(ticks, hop)), axis=1))
+
+        # Normalise against the loud end of this reply rather than full scale
+        peak = np.percentile(rms, 95)
+        return np.clip(rms / peak, 0.0, 1.0) if peak > 0 else rms
+
+    def mouth_order(self, frames):
+        # frames[0] is taken as the closed mouth; the rest are ranked by how far they open
+        closed = frames[0].astype(np.int16)
+        distance = [np.abs(frame.astype(np.int16) - closed).mean() for frame in frames]
+        return np.argsort(distance, kind='stable')
+
+    def schedule(self, audio_file, frames):
+        """Returns one frame index per animation tick, or None if the audio can't be read."""
+        try:
+            envelope = self.envelope(audio_file)
+        except (wave.Error, ValueError, EOFError, OSError) as e:
+            logger.warning(f"Lip-sync envelope unavailable for {audio_file}: {e}")
+            return None
+
+        order = self.mouth_order(frames)
+        levels = min(self.levels or len(order), len(order))
+
+        # Silent ticks keep the mouth closed; the rest spread over the open frames
+        steps = np.ceil(envelope * (levels - 1)).astype(np.intp)
+        steps[envelope < self.silence_threshold] = 0
+        return order[np.clip(steps, 0, levels - 1)]
+
+    def frame_at(self, schedule, position_ms):
+        if position_ms < 0:
+            return None
+        tick = int(position_ms * self.frame_rate / 1000)
+        if tick >= len(schedule):
+            # Past the end of the speech the mouth rests closed: order[0] in schedule(),
+            # which is always frame 0 since it has no distance from itself
+            return 0
+        return int(schedule[tick])
@@ -0,0 +1,92 @@
+from abc import ABC, abstractmethod
+from display.assets import UIAssets
+from display.atlas import LEVEL_STEPS, level_step, step_level
+from display.widgets import Icon, Label, Screen, VerticalSlider
+from transmission.buttons import DOWN, LEFT, RELEASE, RIGHT, UP
+
+class SettingSlider(ABC):
+    # Shared body of the volume and brightness screens: an icon, a title, a vertical
+    # slider in 0.05 steps and its button handling. Subclasses name the screen and
+    # decide where the level is previewed and committed.
+    name = None
+    icon = None
+    title = None
+    follows_brightness = True
+
+    def __init__(self, serial_module, mcu_module, assets=None, atlas=None):
+        self.serial_module = serial_module
+        self.input_serial = mcu_module
+        self.background_color = (73, 80, 87)
+        self.text_color = (255, 255, 255)
+        self.highlight_color = (0, 119, 255)
+        self.display_size = (240, 240)
+        self.assets = assets or UIAssets(self.background_color, self.text_color)
+        self.level = self.committed_level()
+
+        icon_size = 24
+        bar_width = 20
+        self.screen = Screen(self.assets, self.display_size, self.background_color)
+        self.screen.add(Icon((self.display_size[0] // 2 - icon_size // 2, 20), self.icon, self.assets))
+        self.screen.add(Label((self.display_size[0] // 2, 20 + icon_size + 5), self.title, self.assets.font(14), self.text_color, align='center'))
+        self.slider = self.screen.add(VerticalSlider(((self.display_size[0] - bar_width) // 2, 80), (bar_width, 140), self.assets.font(14),
+                                                     self.text_color, self.highlight_color, self.background_color, self.level))
+
+        self.atlas = atlas
+        if self.atlas:
+            self.atlas.register(self.name, self.encode_step, range(LEVEL_STEPS + 1), follows_brightness=self.follows_brightness)
+
+    @abstractmethod
+    def committed_level(self):
+        ...
+
+    def preview(self, level):
+        pass
+
+    def finish_frame(self, image, level):
+        return image
+
+    def create_image(self, level=None):
+        self.slider.value = self.level if level is None else level
+        return self.screen.render()
+
+    def encode_frame(self, level):
+        return self.screen.encode(self.finish_frame(self.create_image(level), level))
+
+    def encode_step(self, step):
+        return self.encode_frame(step_level(step))
+
+    def update_display(self):
+        self.preview(self.level)
+
+        step = level_step(self.level)
+        if self.atlas and step is not None:
+            img_byte_arr = self.atlas.frame(self.name, step)
+        else:
+            img_byte_arr = self.encode_frame(self.level)
+
+        self.serial_module.send_image_data(img_byte_arr)
+
+    def enter(self):
+        # The value may have changed elsewhere (e.g. a voice command) since the last visit
+        self.level = self.committed_level()
+        self.update_display()
+
+    def handle_event(self, event):
+        """Returns ('confirm' | 'back', level) when the screen is done, None while it stays open."""
+        if event.kind == RELEASE:
+            return None
+
+        # UP/DOWN repeat while held, so holding a button sweeps the slider
+        if event.button == UP:
+            self.level = min(1.0, round(self.level + 0.05, 2))
+            self.update_display()
+        elif event.button == DOWN:
+            self.level = max(0.0, round(self.level - 0.05, 2))
+            self.update_display()
+        elif event.button == RIGHT:
+            return 'confirm', self.level
+        elif event.button == LEFT:
+            self.level = self.committed_level()
+            self.preview(self.level)
+            return 'back', self.level
+        return None
@@ -0,0 +1,206 @@
+from PIL import Image, ImageDraw
+
+import io
+
+class Widget:
+    # A retained piece of a screen. The static part is drawn once into the screen's
+    # base layer; the dynamic part is drawn on a copy of it whenever the widget is dirty.
+    def __init__(self, position):
+        self.position = position
+        self.static_dirty = True
+        self.dirty = True
+
+    def invalidate(self, static=False):
+        if static:
+            self.static_dirty = True
+        self.dirty = True
+
+    def draw_static(self, image, draw):
+        pass
+
+    def draw(self, image, draw):
+        pass
+
+class Label(Widget):
+    def __init__(self, position, text, font, color, align='left'):
+        super().__init__(position)
+        self._text = text
+        self.font = font
+        self.color = color
+        self.align = align
+
+    @property
+    def text(self):
+        return self._text
+
+    @text.setter
+    def text(self, text):
+        if text != self._text:
+            self._text = text
+            self.invalidate(static=True)
+
+    def draw_static(self, image, draw):
+        x, y = self.position
+        if self.align == 'center':
+            text_bbox = draw.textbbox((0, 0), self._text, font=self.font)
+            x -= (text_bbox[2] - text_bbox[0]) // 2
+        draw.text((x, y), self._text, font=self.font, fill=self.color)
+
+class Icon(Widget):
+    def __init__(self, position, name, assets, color=None):
+        super().__init__(position)
+        self.name = name
+        self.assets = assets
+        self.color = color
+
+    def draw_static(self, image, draw):
+        self.assets.paste_icon(image, self.name, self.position, icon_color=self.color)
+
+class VerticalSlider(Widget):
+    def __init__(self, position, size, font, text_color, fill_color, background_color, value=0.0):
+        super().__init__(position)
+        self.size = size
+        self.font = font
+        self.text_color = text_color
+        self.fill_color = fill_color
+        self.background_color = background_color
+        self._value = value
+
+    @property
+    def value(self):
+        return self._value
+
+    @value.setter
+    def value(self, value):
+        if value != self._value:
+            self._value = value
+            self.dirty = True
+
+    def draw_static(self, image, draw):
+        bar_x, bar_y = self.position
+        bar_width, bar_height = self.size
+        draw.rectangle([bar_x, bar_y, bar_x + bar_width, bar_y + bar_height], outline=self.text_color)
+
+    def draw(self, image, draw):
+        bar_x, bar_y = self.position
+        bar_width, bar_height = self.size
+        filled_height = int(bar_height * self._value)
+        draw.rectangle([bar_x, bar_y + bar_height - filled_height, bar_x + bar_width, bar_y + bar_height], fill=self.fill_color)
+
+        # Draw white horizontal bar (slider)
+        slider_width = 30
+        slider_height = 4
+        slider_y = bar_y + bar_height - filled_height - slider_height // 2
+        draw.rectangle([bar_x - (slider_width - bar_width) // 2, slider_y,
+                        bar_x + bar_width + (slider_width - bar_width) // 2, slider_y + slider_height],
+                    fill=self.text_color)
+
+        # Draw the value in a circle
+        value_size = 30
+        value_x = bar_x + bar_width + 20
+        value_y = slider_y + slider_height // 2
+        draw.ellipse([value_x, value_y - value_size//2, value_x + value_size, value_y + value_size//2], fill=self.text_color)
+        percentage_text = f"{int(self._value * 100)}"
+        text_bbox = draw.textbbox((0, 0), percentage_text, font=self.font)
+        text_width = text_bbox[2] - text_bbox[0]
+        text_height = text_bbox[3] - text_bbox[1]
+        text_x = value_x + (value_size - text_width) // 2
+        text_y = value_y - text_height // 2
+        vertical_adjustment = -1
+        text_y += vertical_adjustment
+        draw.text((text_x, text_y), percentage_text, font=self.font, fill=self.background_color)
+
+class ListMenu(Widget):
+    # Unselected rows live in the base layer; only the highlight and the selected row are dynamic
+    def __init__(self, position, items, assets, font, text_color, highlight_color, highlight_text_color,
+                 row_height=40, width=140, selected=0):
+        super().__init__(position)
+        self.items = items
+        self.assets = assets
+        self.font = font
+        self.text_color = text_color
+        self.highlight_color = highlight_color
+        self.highlight_text_color = highlight_text_color
+        self.row_height = row_height
+        self.width = width
+        self._selected = selected
+
+    @property
+    def selected(self):
+        return self._selected
+
+    @selected.setter
+    def selected(self, selected):
+        if selected != self._selected:
+            self._selected = selected
+            self.dirty = True
+
+    def draw_item(self, image, draw, index, color):
+        x, y = self.position
+        item = self.items[index]
+        y_position = y + index * self.row_height
+        self.assets.paste_icon(image, item['icon'], (x + 15, y_position), icon_color=color)
+        draw.text((x + 45, y_position), item['text'], font=self.font, fill=color)
+
+    def draw_static(self, image, draw):
+        for i in range(len(self.items)):
+            self.draw_item(image, draw, i, self.text_color)
+
+    def draw(self, image, draw):
+        x, y = self.position
+        y_position = y - 5 + self._selected * self.row_height
+        draw.rounded_rectangle([x, y_position, x + self.width, y_position + 35], radius = 8, fill=self.highlight_color)
+        self.draw_item(image, draw, self._selected, self.highlight_text_color)
+
+class Screen:
+    # A set of widgets rendered in two layers: the static base is rebuilt only when a
+    # static part changes, and the frame is recomposed only when something is dirty.
+    def __init__(self, assets, size=(240, 240), background_color=(73, 80, 87), navigation=True):
+        self.assets = assets
+        self.size = size
+        self.background_color = background_color
+        self.navigation = navigation
+        self.widgets = []
+        self.base_image = None
+        self.image = None
+
+    def add(self, widget):
+        self.widgets.append(widget)
+        return widget
+
+    @property
+    def dirty(self):
+        return self.image is None or any(widget.dirty for widget in self.widgets)
+
+    def invalidate(self):
+        self.base_image = None
+        self.image = None
+
+    def render_base(self):
+        image = Image.new('RGB', self.size, self.background_color)
+        draw = ImageDraw.Draw(image)
+        for widget in self.widgets:
+            widget.static_dirty = False
+            widget.draw_static(image, draw)
+        if self.navigation:
+            self.assets.draw_navigation(draw)
+        return image
+
+    def render(self):
+        if self.base_image is None or any(widget.static_dirty for widget in self.widgets):
+            self.base_image = self.render_base()
+            self.image = None
+
+        if self.dirty:
+            image = self.base_image.copy()
+            draw = ImageDraw.Draw(image)
+            for widget in self.widgets:
+                widget.dirty = False
+                widget.draw(image, draw)
+            self.image = image
+        return self.image
+
+    def encode(self, image=None, format='PNG'):
+        img_byte_arr = io.BytesIO()
+        (image or self.render()).save(img_byte_arr, format=format)
+        return img_byte_arr.getvalue()
@@ -0,0 +1,108 @@
+from etc.define import logger
+
+import heapq
+import itertools
+import threading
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+# Background work (cache warming) that gives way to animation frames
+PRIORITY_LOW = 2
+
+# Long enough for a legacy frame send with all its retries
+CALL_TIMEOUT = 30
+
+class DisplayJob:
+    def __init__(self, func, args):
+        self.func = func
+        self.args = args
+        self.done = threading.Event()
+        self.result = None
+
+    def run(self):
+        try:
+            self.result = self.func(*self.args)
+        except Exception as e:
+            logger.warning(f"Display job {getattr(self.func, '__name__', self.func)} failed: {e}")
+            self.result = False
+        finally:
+            self.done.set()
+
+class DisplayWorker(threading.Thread):
+    # The only thread that writes to the LCD serial port. One-shot frames and
+    # commands go through a priority queue and are never dropped; animation
+    # frames go through a single-slot mailbox where the latest frame wins, so a
+    # slow link skips stale frames instead of queueing them.
+    def __init__(self, send_frame):
+        super().__init__(name="DisplayWorker", daemon=True)
+        self.send_frame = send_frame
+        self.condition = threading.Condition()
+        self.jobs = []
+        self.counter = itertools.count()
+        self.latest_frame = None
+        self.frames_sent = 0
+        self.frames_dropped = 0
+        self.stopped = False
+
+    def call(self, func, *args, priority=PRIORITY_NORMAL, wait=True, timeout=CALL_TIMEOUT):
+        job = DisplayJob(func, args)
+        if threading.current_thread() is self:
+            job.run()
+            return job.result
+
+        with self.condition:
+            if self.stopped:
+                logger.warning(f"Display worker is stopped, dropping {getattr(func, '__name__', func)}")
+                return False if wait else None
+            heapq.heappush(self.jobs, (priority, next(self.counter), job))
+            self.condition.notify()
+        if not wait:
+            return None
+        if not job.done.wait(timeout):
+            logger.warning("Timed out waiting for the display worker")
+            return False
+        return job.result
+
+    def show_animation_frame(self, frame):
+        with self.condition:
+            if self.latest_frame is not None:
+                self.frames_dropped += 1
+            self.latest_frame = frame
+            self.condition.notify()
+
+    def clear_animation(self):
+        with self.condition:
+            self.latest_frame = None
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            # Nobody will run the queued jobs, so their callers must not keep waiting
+            for _, _, job in self.jobs:
+                job.result = False
+                job.done.set()
+            self.jobs.clear()
+            self.condition.notify()
+
+    def run(self):
+        while True:
+            with self.condition:
+                while not self.stopped and not self.jobs and self.latest_frame is None:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                if self.jobs and (self.jobs[0][0] < PRIORITY_LOW or self.latest_frame is None):
+                    _, _, job = heapq.heappop(self.jobs)
+                    frame = None
+                else:
+                    job = None
+                    frame, self.latest_frame = self.latest_frame, None
+
+            if job is not None:
+                job.run()
+            else:
+                try:
+                    self.send_frame(frame)
+                    self.frames_sent += 1
+                except Exception as e:
+                    logger.warning(f"Failed to send animation frame: {e}")
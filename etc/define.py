@@ -30,6 +30,13 @@ VOICE_TRIGGER_DIR = os.path.join(ASSETS_DIR, 'trigger')
 # Define the temporary ai output audio file
 TEMP_AUDIO_FILE = os.path.join(AUDIO_DIR, 'output.wav')
 
+# Define the on-disk cache of synthesized speech
+TTS_CACHE_DIR = os.path.join(AUDIO_DIR, 'tts_cache')
+
+# Define the per-stage latency trace (JSON lines, rotated)
+LOG_DIR = os.path.join(PARENT_DIR, 'logs')
+TraceFile = os.path.join(LOG_DIR, 'trace.jsonl')
+
 # Define the firebase credentials directory
 FIRE_CRED_DIR = os.path.join(PARENT_DIR, 'secrets')
 
@@ -88,6 +95,14 @@ PicoWakeWordSatoru = os.path.join(VOICE_TRIGGER_DIR,"pico_voice_wake_word_satoru
 ToshibaVoiceDictionary = os.path.join(VOICE_TRIGGER_DIR,"toshiba_voice_dict_jaJP.vtdic")
 ToshibaVoiceLibrary = os.path.join(VOICE_TRIGGER_DIR,"libVT_ARML64h.so")
 
+# offline speech to text (Vosk Japanese model, downloaded separately)
+STT_MODEL_DIR = os.path.join(ASSETS_DIR, 'stt')
+LocalSTTModel = os.path.join(STT_MODEL_DIR, "vosk-model-small-ja-0.22")
+
+# offline text to speech (Open JTalk system packages)
+OpenJTalkDictionary = "/var/lib/mecab/dic/open-jtalk/naist-jdic"
+OpenJTalkVoice = "/usr/share/hts-voice/nitech-jp-atr503-m001/nitech_jp_atr503_m001.htsvoice"
+
 # Serial/Display Settings
 BautRate = '230400'
 
@@ -0,0 +1,30 @@
+from collections import deque
+from typing import Optional
+
+import bisect
+
+class LatencyHistogram:
+    BUCKETS_MS = [50, 100, 200, 500, 1000, 2000, 5000, 10000, 30000]
+
+    def __init__(self, window: int = 200):
+        self.counts = [0] * (len(self.BUCKETS_MS) + 1)
+        self.samples = deque(maxlen=window)
+
+    def record(self, seconds: float):
+        milliseconds = seconds * 1000
+        self.counts[bisect.bisect_left(self.BUCKETS_MS, milliseconds)] += 1
+        self.samples.append(seconds)
+
+    def percentile(self, percent: float) -> Optional[float]:
+        if not self.samples:
+            return None
+        ordered = sorted(self.samples)
+        index = min(len(ordered) - 1, int(round(percent / 100 * (len(ordered) - 1))))
+        return ordered[index]
+
+    def summary(self) -> str:
+        if not self.samples:
+            return "no samples"
+        labels = [f"<={b}ms" for b in self.BUCKETS_MS] + [f">{self.BUCKETS_MS[-1]}ms"]
+        buckets = ", ".join(f"{label}: {count}" for label, count in zip(labels, self.counts) if count)
+        return f"p50 {self.percentile(50):.3f}s, p95 {self.percentile(95):.3f}s, n={sum(self.counts)} ({buckets})"
@@ -0,0 +1,102 @@
+from etc.define import logger
+
+import collections
+import numpy as np
+import time
+
+ACTIVE = 'active'
+IDLE = 'idle'
+
+class PowerPolicy:
+    # Presence-driven runtime mode. After idle_timeout seconds without anyone in
+    # front of the IR sensor (or a button press) the device goes idle: the backlight
+    # dims, energy calibration pauses, sensor uploads slow down and the wake word
+    # engine only sees audio that rises above the noise floor. Any presence goes
+    # back to active on the next audio frame.
+    #
+    # observe() may be called from the MCU reader thread; mode changes only happen
+    # in update(), on the wake word loop, because they send MCU commands.
+    def __init__(self, serial_module, idle_timeout=10 * 60, idle_backlight=0.1, idle_telemetry_interval=15 * 60,
+                 gate_factor=2.0, gate_hangover=2.0, pre_roll_frames=16):
+        self.serial_module = serial_module
+        self.idle_timeout = idle_timeout
+        self.idle_backlight = idle_backlight
+        self.idle_telemetry_interval = idle_telemetry_interval
+        self.gate_factor = gate_factor
+        self.gate_hangover = gate_hangover
+        self.mode = ACTIVE
+        self.last_presence = time.monotonic()
+        self.pre_roll = collections.deque(maxlen=pre_roll_frames)
+        self.gate_open_until = 0.0
+        self.frames_seen = 0
+        self.frames_processed = 0
+
+    @property
+    def idle(self):
+        return self.mode == IDLE
+
+    def observe(self, inputs):
+        if inputs and 'result' in inputs:
+            result = inputs['result']
+            if result.get('ir_detect') or any(result.get('buttons', [])):
+                self.last_presence = time.monotonic()
+
+    def mark_active(self):
+        # A wake word or a scheduled conversation needs full rate and the backlight right away
+        self.last_presence = time.monotonic()
+        self.set_mode(ACTIVE)
+
+    def update(self, now=None):
+        now = time.monotonic() if now is None else now
+        if now - self.last_presence >= self.idle_timeout:
+            self.set_mode(IDLE)
+        else:
+            self.set_mode(ACTIVE)
+
+    def set_mode(self, mode):
+        if mode == self.mode:
+            return
+        self.mode = mode
+
+        if self.frames_seen:
+            logger.info(f"Power mode: {mode} (wake word engine saw {self.frames_processed}/{self.frames_seen} frames)")
+        else:
+            logger.info(f"Power mode: {mode}")
+        self.frames_seen = self.frames_processed = 0
+        self.pre_roll.clear()
+        self.gate_open_until = 0.0
+
+        if self.serial_module.backlight_supported:
+            level = self.serial_module.current_brightness
+            self.serial_module.set_backlight(level * self.idle_backlight if mode == IDLE else level)
+
+    def telemetry_due(self, last_upload):
+        # last_upload is a time.monotonic() stamp, or None before the first upload
+        return not self.idle or last_upload is None or time.monotonic() - last_upload >= self.idle_telemetry_interval
+
+    def frames_to_process(self, audio_frame, recorder, now=None):
+        """Returns the frames the wake word engine should see for this audio frame."""
+        self.frames_seen += 1
+        silence_energy = recorder.silence_energy
+        if self.mode == ACTIVE or not silence_energy:
+            self.frames_processed += 1
+            return [audio_frame]
+
+        now = time.monotonic() if now is None else now
+        # Same low-passed energy the recorder calibrated silence_energy with
+        energy = recorder.frame_energy(np.asarray(audio_frame, dtype=np.int16))
+
+        if energy > silence_energy * self.gate_factor:
+            # Replay the frames just before the gate opened so the start of the wake word is kept
+            frames = list(self.pre_roll) if now >= self.gate_open_until else []
+            self.pre_roll.clear()
+            self.gate_open_until = now + self.gate_hangover
+            frames.append(audio_frame)
+        elif now < self.gate_open_until:
+            frames = [audio_frame]
+        else:
+            self.pre_roll.append(audio_frame)
+            frames = []
+
+        self.frames_processed += len(frames)
+        return frames
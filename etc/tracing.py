@@ -0,0 +1,128 @@
+from collections import defaultdict
+from contextlib import contextmanager
+from etc.define import logger
+from etc.histogram import LatencyHistogram
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+class JSONLineFormatter(logging.Formatter):
+    def format(self, record):
+        return json.dumps(record.msg, ensure_ascii=False)
+
+class EntryQueueHandler(QueueHandler):
+    # Enqueues the entry dict untouched; it is serialized and written on the listener thread
+    def prepare(self, record):
+        return record
+
+class Tracer:
+    # Per-stage latency of the conversation pipeline. Every span is written as
+    # one JSON line to the trace file (when one is open) and recorded in a rolling
+    # histogram per span name, so the summary shows recent p50/p95 per stage.
+    #
+    # Writing only enqueues the entry, so spans on the audio and display paths never
+    # wait for JSON encoding or the file.
+    #
+    # Spans carry the conversation and turn they belong to: a conversation starts
+    # at the wake word (or a scheduled reminder), a turn at each recorded question.
+    def __init__(self, window=200):
+        self.window = window
+        self.histograms = defaultdict(lambda: LatencyHistogram(self.window))
+        self.marks = {}
+        self.conversation = 0
+        self.turn = 0
+        self.lock = threading.Lock()
+        self.sink = None
+        self.listener = None
+
+    def open(self, path, max_bytes=5 * 1024 * 1024, backup_count=2):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        handler = RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count)
+        handler.setFormatter(JSONLineFormatter())
+        entries = queue.SimpleQueue()
+        self.listener = QueueListener(entries, handler)
+        self.listener.start()
+        self.sink = logging.getLogger("trace")
+        self.sink.propagate = False
+        self.sink.setLevel(logging.INFO)
+        self.sink.handlers = [EntryQueueHandler(entries)]
+        logger.info(f"Writing latency traces to {path}")
+
+    def close(self):
+        if self.sink is not None:
+            self.sink.handlers = []
+            self.sink = None
+        if self.listener is not None:
+            # Writes out whatever is still queued
+            self.listener.stop()
+            for handler in self.listener.handlers:
+                handler.close()
+            self.listener = None
+
+    def begin_conversation(self):
+        with self.lock:
+            self.conversation += 1
+            self.turn = 0
+            self.marks.clear()
+
+    def begin_turn(self):
+        with self.lock:
+            self.turn += 1
+
+    def write(self, entry):
+        sink = self.sink
+        if sink is not None:
+            sink.info(entry)
+
+    def record(self, name, start, end=None, **fields):
+        """Records a span from start to end, both from one clock; end defaults to time.perf_counter()."""
+        end = time.perf_counter() if end is None else end
+        with self.lock:
+            self.histograms[name].record(end - start)
+            entry = {"t": round(time.time(), 3), "conversation": self.conversation, "turn": self.turn,
+                     "span": name, "ms": round((end - start) * 1000, 1)}
+        entry.update(fields)
+        self.write(entry)
+
+    @contextmanager
+    def span(self, name, **fields):
+        # The yielded dict takes fields only known at the end, e.g. a result size
+        start = time.perf_counter()
+        try:
+            yield fields
+        except BaseException as e:
+            fields["error"] = type(e).__name__
+            raise
+        finally:
+            self.record(name, start, **fields)
+
+    def mark(self, name):
+        self.marks[name] = time.perf_counter()
+
+    def since(self, mark, name, **fields):
+        # Spans that cross stages, e.g. end of recording to the first reply audio;
+        # a mark is used once
+        start = self.marks.pop(mark, None)
+        if start is not None:
+            self.record(name, start, **fields)
+
+    def summary(self):
+        with self.lock:
+            return {name: {"p50": round(histogram.percentile(50), 3), "p95": round(histogram.percentile(95), 3),
+                           "n": len(histogram.samples)}
+                    for name, histogram in sorted(self.histograms.items()) if histogram.samples}
+
+    def log_summary(self):
+        summary = self.summary()
+        if not summary:
+            return
+        self.write({"t": round(time.time(), 3), "summary": summary})
+        stages = ", ".join(f"{name} {stats['p50']:.3f}/{stats['p95']:.3f}s" for name, stats in summary.items())
+        logger.info(f"Latency p50/p95 over the last {self.window} samples: {stages}")
+
+tracer = Tracer()
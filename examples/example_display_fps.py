@@ -0,0 +1,62 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from display.compositing import ImageCompositor
+from etc.define import BautRate, SeamanLogo, USBPort
+from transmission.framing import FramedLink
+
+import argparse
+import serial
+import time
+
+# Sustained frames/sec on the LCD link: the legacy 'test' probe + wait-for-any-byte
+# exchange against the framed, pipelined protocol (needs framed display firmware).
+
+def legacy_send(comm, img_data, timeout=5):
+    comm.write('test'.encode())
+    time.sleep(0.01)
+    comm.read_all()
+    comm.write(img_data)
+    comm.flush()
+    start = time.time()
+    while time.time() - start < timeout:
+        if comm.in_waiting:
+            comm.read_all()
+            return True
+        time.sleep(0.1)
+    return False
+
+def main():
+    parser = argparse.ArgumentParser(description="LCD link throughput benchmark")
+    parser.add_argument('--port', default=USBPort)
+    parser.add_argument('--frames', type=int, default=30)
+    parser.add_argument('--window', type=int, default=3)
+    args = parser.parse_args()
+
+    compositor = ImageCompositor(SeamanLogo, size=(240, 240))
+    frames = [compositor.encode(level / args.frames) for level in range(1, args.frames + 1)]
+    print(f"{len(frames)} frames, average {sum(map(len, frames)) / len(frames):.0f} bytes")
+
+    comm = serial.Serial(args.port, BautRate, timeout=0.1)
+    try:
+        start = time.perf_counter()
+        for frame in frames:
+            legacy_send(comm, frame)
+        print(f"legacy: {len(frames) / (time.perf_counter() - start):.2f} frames/sec")
+
+        link = FramedLink(comm, window=args.window)
+        if not link.handshake():
+            print("framed: display firmware did not answer HELLO, skipping")
+            return
+
+        link.reset_stats()
+        for frame in frames:
+            link.send(frame)
+        link.flush()
+        stats = link.stats()
+        print(f"framed: {stats['fps']:.2f} frames/sec, {stats['bytes_per_sec'] / 1024:.1f} KiB/s, {stats['frames_failed']} dropped")
+    finally:
+        comm.close()
+
+if __name__ == "__main__":
+    main()
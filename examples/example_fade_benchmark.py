@@ -0,0 +1,60 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from display.compositing import ImageCompositor
+from PIL import Image, ImageEnhance
+
+import argparse
+import io
+import time
+
+# Frames per second of one fade/brightness step: the previous PIL pipeline
+# against the NumPy lookup-table compositor, with and without PNG encoding.
+
+LOGO = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'assets', 'images', 'logo.png')
+
+def pil_step(img, alpha, brightness):
+    faded_img = Image.new("RGBA", img.size, (0, 0, 0, 0))
+    faded_img.paste(img, (0, 0))
+    faded_img.putalpha(alpha)
+
+    rgb_img = Image.new("RGB", faded_img.size, (0, 0, 0))
+    rgb_img.paste(faded_img, mask=faded_img.split()[3])
+
+    return ImageEnhance.Brightness(rgb_img).enhance(brightness)
+
+def encode(img):
+    img_byte_arr = io.BytesIO()
+    img.save(img_byte_arr, format='PNG')
+    return img_byte_arr.getvalue()
+
+def measure(step, frames):
+    start = time.perf_counter()
+    for i in range(frames):
+        step(i)
+    return frames / (time.perf_counter() - start)
+
+def main():
+    parser = argparse.ArgumentParser(description="Fade/brightness compositing benchmark")
+    parser.add_argument('--image', default=LOGO)
+    parser.add_argument('--frames', type=int, default=200)
+    parser.add_argument('--steps', type=int, default=7)
+    args = parser.parse_args()
+
+    img = Image.open(args.image)
+    compositor = ImageCompositor(img)
+    levels = [(i % args.steps + 1) / args.steps for i in range(args.frames)]
+
+    results = [
+        ("PIL render", lambda i: pil_step(img, int(255 * levels[i]), levels[i])),
+        ("LUT render", lambda i: compositor.render(levels[i] * levels[i])),
+        ("PIL render + PNG", lambda i: encode(pil_step(img, int(255 * levels[i]), levels[i]))),
+        ("LUT render + PNG", lambda i: compositor.encode(levels[i] * levels[i])),
+    ]
+
+    print(f"Image: {args.image} {img.size}, {args.frames} frames")
+    for name, step in results:
+        print(f"{name:>18}: {measure(step, args.frames):8.1f} frames/sec")
+
+if __name__ == "__main__":
+    main()
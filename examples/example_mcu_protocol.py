@@ -0,0 +1,89 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from transmission.framing import FrameParser, pack_frame
+from transmission.mcu_protocol import BinaryMCULink, FRAME_GET_INPUTS, FRAME_INPUTS, FRAME_JSON, MCU_PROTOCOL_VERSION, pack_inputs
+
+import argparse
+import json
+import random
+import time
+
+# Host-side cost of one getInputs poll, JSON lines against the binary protocol.
+# The MCU is simulated in-process, so this measures encoding, parsing and bytes
+# on the wire, not the UART itself. With --port it polls a real MCU instead.
+
+class SimulatedMCU:
+    # Answers like the firmware would, buffering replies for read()/readline()
+    def __init__(self):
+        self.parser = FrameParser()
+        self.out = bytearray()
+        self.bytes_written = 0
+        self.bytes_read = 0
+        self.in_waiting = 0
+
+    def sample(self):
+        return [random.random() < 0.1 for _ in range(6)], 25 + random.random() * 5, random.random() < 0.5, random.random() * 500
+
+    def write(self, data):
+        self.bytes_written += len(data)
+        if data.startswith(b'{'):
+            buttons, thermal, ir_detect, luminosity = self.sample()
+            reply = {"result": {"buttons": buttons, "thermal": thermal, "ir_detect": ir_detect, "luminosity": luminosity}}
+            self.out += json.dumps(reply).encode() + b'\n'
+        for frame_type, sequence, payload in self.parser.feed(data):
+            if frame_type == FRAME_GET_INPUTS:
+                self.out += pack_frame(FRAME_INPUTS, sequence, pack_inputs(*self.sample()))
+            elif frame_type == FRAME_JSON:
+                self.out += pack_frame(FRAME_JSON, sequence, b'{"result": "ok"}')
+        self.in_waiting = len(self.out)
+
+    def read(self, size=1):
+        data = bytes(self.out[:size])
+        del self.out[:size]
+        self.bytes_read += len(data)
+        self.in_waiting = len(self.out)
+        return data
+
+    def readline(self):
+        end = self.out.find(b'\n') + 1
+        return self.read(end or len(self.out))
+
+def json_poll(port):
+    port.write(json.dumps({"method": "getInputs"}).encode() + b'\n')
+    return json.loads(port.readline().decode().strip())
+
+def measure(poll, port, polls):
+    written, read = getattr(port, 'bytes_written', 0), getattr(port, 'bytes_read', 0)
+    start = time.perf_counter()
+    for _ in range(polls):
+        result = poll()
+        assert result and len(result['result']['buttons']) == 6
+    elapsed = time.perf_counter() - start
+    per_poll = (getattr(port, 'bytes_written', 0) - written + getattr(port, 'bytes_read', 0) - read) / polls
+    return elapsed / polls * 1e6, per_poll
+
+def main():
+    parser = argparse.ArgumentParser(description="MCU getInputs protocol benchmark")
+    parser.add_argument('--polls', type=int, default=5000)
+    parser.add_argument('--port', help="Serial port of a real MCU, e.g. /dev/ttyACM0")
+    args = parser.parse_args()
+
+    if args.port:
+        import serial
+        port = serial.Serial(args.port, 230400, timeout=1)
+        port.write(json.dumps({"method": "setProtocol", "params": {"format": "binary", "version": MCU_PROTOCOL_VERSION}}).encode() + b'\n')
+        print(f"setProtocol: {port.readline().decode().strip()}")
+        results = [("binary", measure(BinaryMCULink(port).get_inputs, port, args.polls))]
+    else:
+        port = SimulatedMCU()
+        results = [
+            ("JSON", measure(lambda: json_poll(port), port, args.polls)),
+            ("binary", measure(BinaryMCULink(port).get_inputs, port, args.polls)),
+        ]
+
+    for name, (usec, size) in results:
+        print(f"{name:>7}: {usec:7.1f} us/poll, {size:5.1f} bytes/poll")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+import argparse
+import os
+import re
+import subprocess
+import time
+
+# Measures the running assistant's CPU use, and the board's power draw where the
+# PMIC can be read (Raspberry Pi 5: `vcgencmd pmic_read_adc`). Run it once while
+# someone is in front of the device and once after the log shows "Power mode: idle",
+# with the same --duration, and compare the two lines.
+
+RAIL = re.compile(r'^\s*(\S+?)_([AV]) \w+\(\d+\)=([\d.]+)[AV]', re.MULTILINE)
+
+def find_pid(pattern):
+    for pid in filter(str.isdigit, os.listdir('/proc')):
+        try:
+            with open(f'/proc/{pid}/cmdline', 'rb') as f:
+                cmdline = f.read().replace(b'\0', b' ').decode(errors='replace')
+        except OSError:
+            continue
+        if pattern in cmdline and "python" in cmdline and int(pid) != os.getpid():
+            return int(pid)
+    return None
+
+def process_cpu_seconds(pid):
+    with open(f'/proc/{pid}/stat') as f:
+        fields = f.read().rsplit(')', 1)[1].split()
+    # utime and stime are fields 14 and 15 of the full line
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK')
+
+def system_cpu_times():
+    with open('/proc/stat') as f:
+        values = [int(v) for v in f.readline().split()[1:]]
+    idle = values[3] + values[4]
+    return sum(values), idle
+
+def board_power_watts():
+    try:
+        output = subprocess.run(['vcgencmd', 'pmic_read_adc'], capture_output=True, text=True, timeout=2).stdout
+    except (OSError, subprocess.TimeoutExpired):
+        return None
+    rails = {}
+    for name, unit, value in RAIL.findall(output):
+        rails.setdefault(name, {})[unit] = float(value)
+    watts = [rail['A'] * rail['V'] for rail in rails.values() if 'A' in rail and 'V' in rail]
+    return sum(watts) if watts else None
+
+def main():
+    parser = argparse.ArgumentParser(description="CPU and power draw of the running assistant")
+    parser.add_argument('--pid', type=int)
+    parser.add_argument('--match', default='app.py', help="Command line substring used to find the process")
+    parser.add_argument('--duration', type=float, default=60)
+    parser.add_argument('--interval', type=float, default=1)
+    parser.add_argument('--label', default='', help="e.g. active or idle")
+    args = parser.parse_args()
+
+    pid = args.pid or find_pid(args.match)
+    if pid is None:
+        raise SystemExit(f"No process matching {args.match!r}")
+
+    cpu_start = process_cpu_seconds(pid)
+    total_start, idle_start = system_cpu_times()
+    start = time.monotonic()
+    power_samples = []
+
+    while time.monotonic() - start < args.duration:
+        watts = board_power_watts()
+        if watts is not None:
+            power_samples.append(watts)
+        time.sleep(args.interval)
+
+    elapsed = time.monotonic() - start
+    process_percent = (process_cpu_seconds(pid) - cpu_start) / elapsed * 100
+    total_end, idle_end = system_cpu_times()
+    system_percent = 100 * (1 - (idle_end - idle_start) / max(1, total_end - total_start))
+
+    power = f"{sum(power_samples) / len(power_samples):.2f} W" if power_samples else "n/a"
+    print(f"{args.label or 'pid ' + str(pid)}: process CPU {process_percent:.1f}% of one core, "
+          f"system CPU {system_percent:.1f}%, board power {power} over {elapsed:.0f}s")
+
+if __name__ == "__main__":
+    main()
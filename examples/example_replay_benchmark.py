@@ -0,0 +1,230 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from replay.fakes import FakePorcupine, Microphone, install
+from replay.session import create_synthetic_session, load_session
+
+import argparse
+import asyncio
+import collections
+import functools
+import numpy as np
+import socket
+import tempfile
+import time
+
+# End-to-end latency of a conversation turn without the hardware. A recorded
+# session (see replay/session.py) is replayed through the real VoiceAssistant:
+# the microphone, Porcupine, the MCU and the LCD are faked, and the backend and
+# the OpenAI API are served locally with the session's replies and latencies.
+# Every stage is timed on the assistant's own methods, with the process CPU time
+# it used (all assistant threads; the fakes' peers run in another process).
+#
+#   python examples/example_replay_benchmark.py --runs 5
+#   python examples/example_replay_benchmark.py --session recordings/kitchen --first-token 1.2
+
+LATENCIES = ('stt', 'first_token', 'token_interval', 'tts', 'tts_chunk_interval')
+STAGES = ["wake", "record", "endpoint", "save_audio", "stt", "llm_first_token", "llm", "tts", "playback"]
+
+class StageClock:
+    def __init__(self, microphone, error_audio):
+        self.microphone = microphone
+        self.error_audio = error_audio
+        self.turns = []
+        self.turn = None
+
+    def span(self, stage, start, end, cpu=None):
+        if self.turn is not None:
+            self.turn[stage] = (end - start, cpu)
+
+    def wrap(self, owner, name, stage):
+        method = getattr(owner, name)
+
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            start, cpu = time.perf_counter(), time.process_time()
+            if stage == "record":
+                self.turn = {"started": start}
+                self.microphone.clip_ended_at = None
+            elif stage == "playback" and self.turn is not None:
+                self.turn["audio_start"] = start
+            try:
+                return method(*args, **kwargs)
+            finally:
+                end = time.perf_counter()
+                self.span(stage, start, end, time.process_time() - cpu)
+                if stage == "playback" and self.turn is not None:
+                    self.turn["audio_end"] = end
+                    self.turn["error_reply"] = bool(args) and args[0] == self.error_audio
+                    self.turns.append(self.turn)
+                    self.turn = None
+                elif stage == "record" and self.turn is not None:
+                    self.turn["speech_end"] = self.microphone.clip_ended_at
+                    self.turn["recorded"] = end
+                    if self.turn.get("speech_end"):
+                        self.span("endpoint", self.turn["speech_end"], end)
+
+        setattr(owner, name, timed)
+
+    def wrap_async(self, owner, name, stage):
+        method = getattr(owner, name)
+
+        @functools.wraps(method)
+        async def timed(*args, **kwargs):
+            start, cpu = time.perf_counter(), time.process_time()
+            try:
+                return await method(*args, **kwargs)
+            finally:
+                self.span(stage, start, time.perf_counter(), time.process_time() - cpu)
+
+        setattr(owner, name, timed)
+
+    def wrap_stream(self, owner, name, stage):
+        method = getattr(owner, name)
+
+        @functools.wraps(method)
+        async def timed(*args, **kwargs):
+            start, cpu = time.perf_counter(), time.process_time()
+            first = True
+            async for item in method(*args, **kwargs):
+                if first:
+                    self.span(stage + "_first_token", start, time.perf_counter(), time.process_time() - cpu)
+                    first = False
+                yield item
+            self.span(stage, start, time.perf_counter(), time.process_time() - cpu)
+
+        setattr(owner, name, timed)
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+def percentile(values, q):
+    return float(np.percentile(values, q)) if values else float('nan')
+
+def report(clock, peers_stats):
+    turns = [turn for turn in clock.turns if not turn.get("error_reply")]
+    failed = len(clock.turns) - len(turns)
+    print(f"\n{len(turns)} turns replayed" + (f", {failed} answered with the error reply" if failed else ""))
+    print(f"{'stage':>16} {'p50 ms':>9} {'p95 ms':>9} {'CPU ms p50':>11}")
+    for stage in STAGES:
+        samples = [turn[stage] for turn in turns if stage in turn]
+        if not samples:
+            continue
+        walls = [wall * 1000 for wall, _ in samples]
+        cpus = [cpu * 1000 for _, cpu in samples if cpu is not None]
+        cpu = f"{percentile(cpus, 50):11.1f}" if cpus else f"{'':>11}"
+        print(f"{stage:>16} {percentile(walls, 50):9.1f} {percentile(walls, 95):9.1f} {cpu}")
+
+    # From the last sample of the question: what the user actually waits for
+    first_audio = [(turn["audio_start"] - turn["speech_end"]) * 1000 for turn in turns if turn.get("speech_end")]
+    turn_time = [(turn["audio_end"] - turn["speech_end"]) * 1000 for turn in turns if turn.get("speech_end")]
+    print(f"{'first audio':>16} {percentile(first_audio, 50):9.1f} {percentile(first_audio, 95):9.1f}")
+    print(f"{'turn':>16} {percentile(turn_time, 50):9.1f} {percentile(turn_time, 95):9.1f}")
+
+    if peers_stats:
+        print(f"\ndisplay: {peers_stats['display_frames']} frames, {peers_stats['display_bytes'] / 1024:.0f} KB; "
+              f"MCU: {peers_stats['mcu_commands']} commands; HTTP: {peers_stats['requests']}")
+
+async def replay(assistant, clock, porcupine, wake_detected, questions, session, runs, new_tts_cache, exit_event):
+    assistant.loop = asyncio.get_running_loop()
+    scheduler_task = asyncio.create_task(assistant.run_scheduler())
+    try:
+        for run in range(runs):
+            porcupine.reset()
+            questions.extend(turn["question_samples"] for turn in session["turns"])
+            # A fresh cache every run, or replies from the previous run would skip TTS
+            assistant.ai_client.tts_cache = new_tts_cache()
+
+            res, trigger_type = await asyncio.to_thread(assistant.listen_for_wake_word)
+            if not res:
+                print(f"run {run + 1}: wake word loop ended without a detection")
+                break
+            wake = (time.perf_counter() - wake_detected[-1], None)
+
+            first_turn = len(clock.turns)
+            await assistant.process_conversation()
+            await assistant.wait_warm_up()
+            if len(clock.turns) > first_turn:
+                clock.turns[first_turn]["wake"] = wake
+            print(f"run {run + 1}: {len(clock.turns) - first_turn} turns")
+    finally:
+        exit_event.set()
+        scheduler_task.cancel()
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a recorded conversation through the assistant without hardware")
+    parser.add_argument('--session', help="Session directory with session.json; a synthetic session is used otherwise")
+    parser.add_argument('--runs', type=int, default=3, help="Wake word activations to replay")
+    parser.add_argument('--speed', type=float, default=1.0, help="Microphone pacing relative to real time")
+    for name in LATENCIES:
+        parser.add_argument(f"--{name.replace('_', '-')}", type=float, dest=name, help=f"Override the session's {name} latency (s)")
+    args = parser.parse_args()
+
+    session_dir = args.session or create_synthetic_session(tempfile.mkdtemp(prefix="replay_session_"))
+    overrides = {name: getattr(args, name) for name in LATENCIES if getattr(args, name) is not None}
+    session = load_session(session_dir, overrides)
+
+    microphone = Microphone(speed=args.speed)
+    questions = collections.deque()
+    wake_detected = []
+
+    def on_stream_open():
+        # Each recording hears the next question; once they run out, only room noise
+        if questions:
+            microphone.queue(questions.popleft())
+
+    wake_frame = max(1, int(session["wake_after"] * 16000 / 512))
+    porcupine = FakePorcupine(wake_frame, on_detect=lambda: wake_detected.append(time.perf_counter()))
+    install(microphone, porcupine, on_stream_open)
+
+    port = free_port()
+    os.environ.update({"SPEAKER_ID": "replay", "SERVER_URL": f"http://127.0.0.1:{port}",
+                       "OPENAI_API_KEY": "replay", "SDL_AUDIODRIVER": "dummy"})
+
+    from replay.peers import Peers
+    peers = Peers(session, port)
+
+    import etc.define
+    etc.define.USBPort, etc.define.MCUPort = peers.lcd_port, peers.mcu_port
+
+    import app
+    from etc.define import ErrorAudio, PicoLangModel, PicoWakeWordSatoru
+    from openAI.conversation import OpenAIClient
+    from openAI.intent import IntentMatcher
+    from openAI.tts_cache import TTSCache
+
+    clock = StageClock(microphone, ErrorAudio)
+
+    async def run():
+        ai_client = OpenAIClient()
+        ai_client.base_url = f"{peers.url}/v1"
+        await ai_client.initialize()
+        assistant_args = argparse.Namespace(access_key="replay", keyword_paths=[PicoWakeWordSatoru], model_path=PicoLangModel,
+                                            sensitivities=[0.5], aiclient=ai_client)
+        assistant = app.VoiceAssistant(assistant_args)
+        ai_client.setAudioPlayer(assistant.audioPlayer)
+        ai_client.setIntentMatcher(IntentMatcher(assistant.audioPlayer, assistant.serial_module))
+
+        clock.wrap(assistant.interactive_recorder, "record_question", "record")
+        clock.wrap(assistant.interactive_recorder, "save_audio", "save_audio")
+        clock.wrap_async(ai_client, "speech_to_text", "stt")
+        clock.wrap_stream(ai_client, "generate_ai_reply", "llm")
+        clock.wrap_async(ai_client, "text_to_speech", "tts")
+        clock.wrap(assistant.audioPlayer, "sync_audio_and_gif", "playback")
+
+        try:
+            await replay(assistant, clock, porcupine, wake_detected, questions, session, args.runs,
+                         lambda: TTSCache(tempfile.mkdtemp(prefix="replay_tts_")), app.exit_event)
+        finally:
+            assistant.cleanup()
+            await ai_client.close()
+
+    try:
+        asyncio.run(run())
+    finally:
+        report(clock, peers.stop())
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,146 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from openAI.sse import SSEDecoder
+
+import argparse
+import json
+import random
+import time
+
+# A stream shaped like a recorded gpt-4 chat completion, one delta per event
+SAMPLE_REPLY = "こんにちは！今日はお薬を飲みましたか？お天気も良いので、少しお散歩するのもいいですね。何かお話ししたいことはありますか？"
+
+def build_stream(reply=SAMPLE_REPLY, repeat=20):
+    events = []
+    for _ in range(repeat):
+        for char in reply:
+            chunk = {"id": "chatcmpl-0", "object": "chat.completion.chunk", "model": "gpt-4",
+                     "choices": [{"index": 0, "delta": {"content": char}, "finish_reason": None}]}
+            events.append(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n")
+    events.append("data: [DONE]\n\n")
+    return "".join(events).encode('utf-8')
+
+def split_stream(stream, chunk_size):
+    return [stream[i:i + chunk_size] for i in range(0, len(stream), chunk_size)]
+
+def split_on_char_boundaries(stream, chunk_size):
+    # Same sizes, but never inside a multibyte character, so the legacy parser can run
+    chunks = []
+    position = 0
+    while position < len(stream):
+        end = min(position + chunk_size, len(stream))
+        while end < len(stream) and (stream[end] & 0xC0) == 0x80:
+            end += 1
+        chunks.append(stream[position:end])
+        position = end
+    return chunks
+
+def random_split(stream, rng, max_chunk=64):
+    chunks = []
+    position = 0
+    while position < len(stream):
+        size = rng.randint(1, max_chunk)
+        chunks.append(stream[position:position + size])
+        position += size
+    return chunks
+
+def legacy_parse(chunks):
+    # The previous generate_ai_reply loop: per-chunk decode, string re-slicing, += accumulation
+    ai_response_text = ""
+    response_buffer = ""
+    for chunk in chunks:
+        response_buffer += chunk.decode('utf-8')
+        while True:
+            try:
+                split_index = response_buffer.index('\n\n')
+                line = response_buffer[:split_index].strip()
+                response_buffer = response_buffer[split_index + 2:]
+                if line.startswith("data: "):
+                    if line == "data: [DONE]":
+                        break
+                    content = json.loads(line[6:])['choices'][0]['delta'].get('content', '')
+                    if content:
+                        ai_response_text += content
+            except ValueError:
+                break
+    return ai_response_text
+
+def decoder_parse(chunks):
+    decoder = SSEDecoder()
+    response_parts = []
+    for chunk in chunks:
+        for event in decoder.feed(chunk):
+            if event.data == "[DONE]":
+                return "".join(response_parts)
+            content = json.loads(event.data)['choices'][0]['delta'].get('content')
+            if content:
+                response_parts.append(content)
+    return "".join(response_parts)
+
+def benchmark(stream, chunk_sizes, rounds):
+    expected = decoder_parse([stream])
+    print(f"Stream: {len(stream)} bytes, {len(expected)} characters")
+    print(f"{'chunk':>8} {'legacy ms':>10} {'decoder ms':>11} {'speedup':>8} {'legacy on byte splits':>22}")
+    for chunk_size in chunk_sizes:
+        chunks = split_on_char_boundaries(stream, chunk_size)
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            legacy_parse(chunks)
+        legacy_ms = (time.perf_counter() - start) * 1000 / rounds
+
+        start = time.perf_counter()
+        for _ in range(rounds):
+            decoder_parse(chunks)
+        decoder_ms = (time.perf_counter() - start) * 1000 / rounds
+
+        # Real network chunks are byte aligned and can split a multibyte character
+        try:
+            legacy_ok = legacy_parse(split_stream(stream, chunk_size)) == expected
+            byte_split = "ok" if legacy_ok else "wrong text"
+        except UnicodeDecodeError:
+            byte_split = "UnicodeDecodeError"
+
+        print(f"{chunk_size:>8} {legacy_ms:10.2f} {decoder_ms:11.2f} {legacy_ms / decoder_ms:7.1f}x {byte_split:>22}")
+
+def fuzz(stream, iterations, seed):
+    rng = random.Random(seed)
+    expected = decoder_parse([stream])
+
+    for iteration in range(iterations):
+        chunks = random_split(stream, rng)
+        result = decoder_parse(chunks)
+        if result != expected:
+            raise AssertionError(f"Mismatch on iteration {iteration} with {len(chunks)} chunks")
+
+    # Every single split point, including inside multibyte characters and CRLFs
+    short_stream = build_stream(repeat=1).replace(b'\n', b'\r\n')
+    short_expected = decoder_parse([short_stream])
+    for position in range(1, len(short_stream)):
+        result = decoder_parse([short_stream[:position], short_stream[position:]])
+        if result != short_expected:
+            raise AssertionError(f"Mismatch when splitting at byte {position}")
+
+    print(f"Fuzz passed: {iterations} random splits, {len(short_stream) - 1} single split points")
+
+def main():
+    parser = argparse.ArgumentParser(description="SSE decoder micro-benchmark and fuzz check")
+    parser.add_argument('--rounds', type=int, default=20)
+    parser.add_argument('--repeat', type=int, default=20, help="Copies of the sample reply in the stream")
+    parser.add_argument('--fuzz_iterations', type=int, default=500)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--stream_file', help="Recorded raw SSE response body to use instead of the synthetic one")
+    args = parser.parse_args()
+
+    if args.stream_file:
+        with open(args.stream_file, 'rb') as f:
+            stream = f.read()
+    else:
+        stream = build_stream(repeat=args.repeat)
+
+    fuzz(stream, args.fuzz_iterations, args.seed)
+    benchmark(stream, [3, 64, 512, 4096, 65536], args.rounds)
+
+if __name__ == "__main__":
+    main()
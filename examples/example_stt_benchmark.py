@@ -0,0 +1,70 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from etc.define import LocalSTTModel, TEMP_AUDIO_FILE
+from openAI import stt_worker
+
+import argparse
+import asyncio
+import time
+import wave
+
+# Real-time factor (processing time / audio duration) of the local and remote
+# STT engines. Run on the Pi with a recorded question, e.g. assets/audio/output.wav.
+
+def audio_duration(audio_file_path):
+    with wave.open(audio_file_path, 'rb') as wf:
+        return wf.getnframes() / wf.getframerate()
+
+def benchmark_local(audio_file_path, model_path, rounds):
+    start = time.perf_counter()
+    stt_worker.load_model(model_path)
+    print(f"Local model load: {time.perf_counter() - start:.2f}s")
+
+    timings = []
+    for _ in range(rounds):
+        start = time.perf_counter()
+        text = stt_worker.transcribe(audio_file_path)
+        timings.append(time.perf_counter() - start)
+    return text, timings
+
+async def benchmark_remote(audio_file_path, rounds):
+    from openAI.conversation import OpenAIClient
+
+    client = OpenAIClient()
+    await client.initialize()
+    timings = []
+    try:
+        for _ in range(rounds):
+            start = time.perf_counter()
+            text = await client.remote_speech_to_text(audio_file_path)
+            timings.append(time.perf_counter() - start)
+    finally:
+        await client.close()
+    return text, timings
+
+def report(name, text, timings, duration):
+    best = min(timings)
+    mean = sum(timings) / len(timings)
+    print(f"{name:>6}: mean {mean:.2f}s, best {best:.2f}s, RTF {mean / duration:.2f} -> {text}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare local and remote STT real-time factor")
+    parser.add_argument('--audio', default=TEMP_AUDIO_FILE, help="16 kHz mono WAV recording")
+    parser.add_argument('--model_path', default=LocalSTTModel)
+    parser.add_argument('--rounds', type=int, default=3)
+    parser.add_argument('--skip_remote', action='store_true')
+    args = parser.parse_args()
+
+    duration = audio_duration(args.audio)
+    print(f"Audio: {args.audio} ({duration:.2f}s)")
+
+    text, timings = benchmark_local(args.audio, args.model_path, args.rounds)
+    report("local", text, timings, duration)
+
+    if not args.skip_remote:
+        text, timings = asyncio.run(benchmark_remote(args.audio, args.rounds))
+        report("remote", text, timings, duration)
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+import sys, os
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from display import assets
+from display.setting import SettingMenu
+
+import argparse
+import time
+
+# Redraw time per button press on the setting screens. "cold" builds the screens
+# from scratch for each press, loading fonts and rasterising icons and layers,
+# which is what each redraw used to cost; "cached" renders from the cached layers; "atlas" replays pre-encoded
+# frames from the frame atlas. The serial link is replaced by a sink.
+
+class SinkSerial:
+    input_serial = None
+    current_brightness = 0.5
+    software_brightness = 0.5
+    backlight_supported = False
+
+    def apply_brightness(self, image):
+        return image
+
+    def send_image_data(self, data):
+        pass
+
+class FixedVolume:
+    current_volume = 0.5
+
+def use_atlas(menu, atlas):
+    for screen in (menu, menu.volume_control, menu.brightness_control):
+        screen.atlas = atlas
+
+def press_menu(menu, i):
+    menu.selected_item = i % len(menu.menu_items)
+    menu.update_display()
+
+def press_volume(menu, i):
+    menu.volume_control.current_volume = (i % 21) * 0.05
+    menu.volume_control.update_display()
+
+def press_brightness(menu, i):
+    menu.brightness_control.current_brightness = (i % 21) * 0.05
+    menu.brightness_control.update_display()
+
+def measure(menu, press, presses, cold):
+    elapsed = 0.0
+    for i in range(presses):
+        start = time.perf_counter()
+        if cold:
+            # A fresh menu has no fonts, icons or layers loaded yet
+            menu = SettingMenu(menu.serial_module, menu.audio_player)
+            use_atlas(menu, None)
+        press(menu, i)
+        elapsed += time.perf_counter() - start
+    return elapsed / presses * 1000
+
+def main():
+    parser = argparse.ArgumentParser(description="Setting screen redraw benchmark")
+    parser.add_argument('--font', help="Font file to use instead of the system fonts")
+    parser.add_argument('--presses', type=int, default=100)
+    args = parser.parse_args()
+
+    if args.font:
+        assets.FONT_PATHS.insert(0, args.font)
+
+    menu = SettingMenu(SinkSerial(), FixedVolume())
+    print(f"Font: {menu.assets.font_path or 'PIL default'}, {args.presses} presses")
+
+    atlas = menu.atlas
+    start = time.perf_counter()
+    atlas.build()
+    print(f"Atlas: {atlas.stats()['frames']} frames, {atlas.stats()['bytes']} bytes, built in {(time.perf_counter() - start) * 1000:.1f} ms")
+
+    for name, press in (("menu", press_menu), ("volume", press_volume), ("brightness", press_brightness)):
+        use_atlas(menu, None)
+        cold = measure(menu, press, args.presses, cold=True)
+        cached = measure(menu, press, args.presses, cold=False)
+        use_atlas(menu, atlas)
+        replay = measure(menu, press, args.presses, cold=False)
+        print(f"{name:>10}: cold {cold:7.2f} ms/press, cached {cached:7.2f} ms/press, atlas {replay:7.3f} ms/press")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,158 @@
+import collections
+import numpy as np
+import sys
+import threading
+import time
+import types
+
+# Stand-ins for the audio hardware modules. They are installed into sys.modules
+# before the assistant is imported, so app.py, pico.py and recorder.py run
+# unchanged: PvRecorder and the PyAudio input stream both read from one
+# Microphone, and Porcupine fires on a chosen frame instead of listening.
+
+class Microphone:
+    # 16 kHz mono timeline: queued clips first, low background noise otherwise.
+    # Reads are paced to real time (or `speed` times faster) like a capture device.
+    def __init__(self, rate=16000, noise_level=200, speed=1.0, seed=0):
+        self.rate = rate
+        self.noise_level = noise_level
+        self.speed = speed
+        self.rng = np.random.default_rng(seed)
+        self.clips = collections.deque()
+        self.position = 0
+        self.next_due = None
+        self.lock = threading.Lock()
+        self.on_clip_end = None
+        self.clip_ended_at = None
+
+    def queue(self, samples):
+        with self.lock:
+            self.clips.append(np.asarray(samples, dtype=np.int16))
+
+    def clear(self):
+        with self.lock:
+            self.clips.clear()
+            self.position = 0
+
+    def read(self, count):
+        with self.lock:
+            out = self.rng.normal(0, self.noise_level, count).astype(np.int16)
+            filled = 0
+            while self.clips and filled < count:
+                clip = self.clips[0]
+                take = min(count - filled, len(clip) - self.position)
+                out[filled:filled + take] = clip[self.position:self.position + take]
+                filled += take
+                self.position += take
+                if self.position >= len(clip):
+                    self.clips.popleft()
+                    self.position = 0
+                    self.clip_ended_at = time.perf_counter()
+
+        # A capture device hands out a buffer once it has been recorded; after a
+        # pause (nobody reading) it starts again from now instead of catching up
+        now = time.perf_counter()
+        if self.next_due is None or now - self.next_due > 0.5:
+            self.next_due = now
+        self.next_due += count / self.rate / self.speed
+        delay = self.next_due - now
+        if delay > 0:
+            time.sleep(delay)
+        return out
+
+class FakePvRecorder:
+    def __init__(self, microphone, frame_length=512, device_index=-1):
+        self.microphone = microphone
+        self.frame_length = frame_length
+        self.is_recording = False
+
+    def start(self):
+        self.is_recording = True
+
+    def stop(self):
+        self.is_recording = False
+
+    def delete(self):
+        pass
+
+    def read(self):
+        return self.microphone.read(self.frame_length).tolist()
+
+class FakePorcupine:
+    # Reports the wake word on the wake_frame'th processed frame of every listening period
+    def __init__(self, wake_frame, on_detect=None, frame_length=512, sample_rate=16000):
+        self.wake_frame = wake_frame
+        self.on_detect = on_detect
+        self.frame_length = frame_length
+        self.sample_rate = sample_rate
+        self.frames = 0
+
+    def reset(self):
+        self.frames = 0
+
+    def process(self, pcm):
+        self.frames += 1
+        if self.frames == self.wake_frame:
+            if self.on_detect:
+                self.on_detect()
+            return 0
+        return -1
+
+    def delete(self):
+        pass
+
+class FakeStream:
+    def __init__(self, microphone, frames_per_buffer, on_open=None):
+        self.microphone = microphone
+        self.frames_per_buffer = frames_per_buffer
+        self.active = True
+        if on_open:
+            on_open()
+
+    def is_active(self):
+        return self.active
+
+    def read(self, num_frames, exception_on_overflow=True):
+        return self.microphone.read(num_frames).tobytes()
+
+    def stop_stream(self):
+        self.active = False
+
+    def close(self):
+        self.active = False
+
+class FakePyAudio:
+    def __init__(self, microphone, on_open=None):
+        self.microphone = microphone
+        self.on_open = on_open
+
+    def open(self, format=None, channels=1, rate=16000, input=False, output=False, frames_per_buffer=1024, **kwargs):
+        return FakeStream(self.microphone, frames_per_buffer, self.on_open)
+
+    def get_sample_size(self, format):
+        return 2
+
+    def get_device_count(self):
+        return 1
+
+    def terminate(self):
+        pass
+
+def install(microphone, porcupine, on_stream_open=None):
+    """Registers fake pyaudio, pvrecorder and pvporcupine modules; call before importing the assistant."""
+    pyaudio = types.ModuleType('pyaudio')
+    pyaudio.paInt16 = 8
+    pyaudio.paFloat32 = 1
+    pyaudio.PyAudio = lambda: FakePyAudio(microphone, on_stream_open)
+
+    pvrecorder = types.ModuleType('pvrecorder')
+    pvrecorder.PvRecorder = lambda frame_length, device_index=-1: FakePvRecorder(microphone, frame_length, device_index)
+
+    pvporcupine = types.ModuleType('pvporcupine')
+    pvporcupine.PorcupineError = type('PorcupineError', (Exception,), {})
+    for name in ('PorcupineInvalidArgumentError', 'PorcupineActivationError', 'PorcupineActivationLimitError',
+                 'PorcupineActivationRefusedError', 'PorcupineActivationThrottledError'):
+        setattr(pvporcupine, name, type(name, (pvporcupine.PorcupineError,), {}))
+    pvporcupine.create = lambda **kwargs: porcupine
+
+    sys.modules.update({'pyaudio': pyaudio, 'pvrecorder': pvrecorder, 'pvporcupine': pvporcupine})
@@ -0,0 +1,232 @@
+from aiohttp import web
+from transmission.framing import FRAME_ACK, FRAME_HELLO, FrameParser, pack_frame
+from transmission.mcu_protocol import FRAME_GET_INPUTS, FRAME_INPUTS, FRAME_JSON, pack_inputs
+
+import asyncio
+import json
+import multiprocessing
+import os
+import tty
+
+# Everything the assistant talks to, run in a child process so its CPU time does
+# not show up in the assistant's numbers:
+#   - the MCU and the LCD as pseudo terminals the serial module opens like ttyACM ports
+#   - one local HTTP server for the backend (token, schedule, sensor upload) and
+#     the OpenAI endpoints, replaying the session's replies with its latencies
+
+class MCUSimulator:
+    # JSON lines until setProtocol, binary frames after it. subscribe is refused,
+    # so the assistant polls the buttons like it does with older firmware.
+    def __init__(self, luminosity=300.0):
+        self.inputs = ([False] * 6, 25.0, True, luminosity)
+        self.binary = False
+        self.parser = FrameParser()
+        self.buffer = bytearray()
+        self.commands = 0
+
+    def handle(self, message):
+        self.commands += 1
+        method = message.get("method")
+        if method == "getInputs":
+            buttons, thermal, ir_detect, luminosity = self.inputs
+            return {"result": {"buttons": buttons, "thermal": thermal, "ir_detect": ir_detect, "luminosity": luminosity}}
+        if method == "subscribe":
+            return {"error": "unsupported"}
+        return {"result": "ok"}
+
+    def feed(self, data):
+        if self.binary:
+            out = bytearray()
+            for frame_type, sequence, payload in self.parser.feed(data):
+                if frame_type == FRAME_GET_INPUTS:
+                    self.commands += 1
+                    out += pack_frame(FRAME_INPUTS, sequence, pack_inputs(*self.inputs))
+                elif frame_type == FRAME_JSON:
+                    out += pack_frame(FRAME_JSON, sequence, json.dumps(self.handle(json.loads(payload))).encode())
+            return bytes(out)
+
+        self.buffer += data
+        out = bytearray()
+        while b'\n' in self.buffer:
+            line, _, rest = bytes(self.buffer).partition(b'\n')
+            self.buffer = bytearray(rest)
+            try:
+                message = json.loads(line)
+            except ValueError:
+                continue
+            out += json.dumps(self.handle(message)).encode() + b'\n'
+            if message.get("method") == "setProtocol" and message.get("params", {}).get("format") == "binary":
+                self.binary = True
+        return bytes(out)
+
+class LCDSimulator:
+    # Framed display firmware: every frame is acknowledged
+    def __init__(self):
+        self.parser = FrameParser()
+        self.frames = 0
+        self.bytes = 0
+
+    def feed(self, data):
+        out = bytearray()
+        for frame_type, sequence, payload in self.parser.feed(data):
+            if frame_type != FRAME_HELLO:
+                self.frames += 1
+                self.bytes += len(payload)
+            out += pack_frame(FRAME_ACK, sequence)
+        return bytes(out)
+
+class ReplayServer:
+    def __init__(self, session):
+        self.session = session
+        self.latency = session["latency"]
+        self.turns = session["turns"]
+        self.requests = {}
+
+    def count(self, name):
+        self.requests[name] = self.requests.get(name, 0) + 1
+        return self.requests[name] - 1
+
+    def turn_for(self, text, fallback, key):
+        for index, turn in enumerate(self.turns):
+            if turn[key].strip() == text.strip():
+                return index
+        return fallback % len(self.turns)
+
+    def build_app(self):
+        app = web.Application(client_max_size=32 * 1024 * 1024)
+        app.router.add_post('/fetch_auth_token', self.auth_token)
+        app.router.add_get('/fetch_schedule', self.schedule)
+        app.router.add_put('/update_sensor_data', self.sensor_data)
+        app.router.add_get('/v1/models', self.models)
+        app.router.add_post('/v1/audio/transcriptions', self.transcriptions)
+        app.router.add_post('/v1/chat/completions', self.chat)
+        app.router.add_post('/v1/audio/speech', self.speech)
+        return app
+
+    async def auth_token(self, request):
+        self.count('auth')
+        return web.json_response({"token": "replay-token"})
+
+    async def schedule(self, request):
+        self.count('schedule')
+        return web.json_response({})
+
+    async def sensor_data(self, request):
+        self.count('sensor')
+        return web.json_response({"success": True})
+
+    async def models(self, request):
+        self.count('models')
+        return web.json_response({"object": "list", "data": []})
+
+    async def transcriptions(self, request):
+        index = self.count('transcriptions') % len(self.turns)
+        await request.read()
+        await asyncio.sleep(self.latency["stt"])
+        return web.Response(text=self.turns[index]["text"])
+
+    def chat_events(self, index, stream):
+        turn = self.turns[index]
+        if turn.get("reply_stream_bytes") and stream:
+            events = [event + b'\n\n' for event in turn["reply_stream_bytes"].split(b'\n\n') if event.strip()]
+            done = [events.pop()] if events and events[-1].startswith(b'data: [DONE]') else [b'data: [DONE]\n\n']
+            reply = []
+        else:
+            events, done, reply = [], [b'data: [DONE]\n\n'], list(turn["reply"])
+
+        if index == len(self.turns) - 1:
+            reply.append("[END_OF_CONVERSATION]")
+        for content in reply:
+            chunk = {"id": "chatcmpl-replay", "object": "chat.completion.chunk", "model": "gpt-4",
+                     "choices": [{"index": 0, "delta": {"content": content}, "finish_reason": None}]}
+            events.append(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode())
+        return events + done
+
+    async def chat(self, request):
+        payload = await request.json()
+        user_messages = [message["content"] for message in payload.get("messages", []) if message.get("role") == "user"]
+        index = self.turn_for(user_messages[-1] if user_messages else "", self.count('chat'), "text")
+
+        await asyncio.sleep(self.latency["first_token"])
+        response = web.StreamResponse(headers={"Content-Type": "text/event-stream"})
+        await response.prepare(request)
+        for event in self.chat_events(index, payload.get("stream", False)):
+            await response.write(event)
+            await asyncio.sleep(self.latency["token_interval"])
+        await response.write_eof()
+        return response
+
+    async def speech(self, request):
+        payload = await request.json()
+        index = self.turn_for(payload.get("input", ""), self.count('speech'), "reply")
+        audio = self.turns[index]["reply_audio_bytes"]
+
+        await asyncio.sleep(self.latency["tts"])
+        response = web.StreamResponse(headers={"Content-Type": "audio/wav"})
+        await response.prepare(request)
+        for start in range(0, len(audio), 4096):
+            await response.write(audio[start:start + 4096])
+            await asyncio.sleep(self.latency["tts_chunk_interval"])
+        await response.write_eof()
+        return response
+
+def open_pty():
+    master, slave = os.openpty()
+    tty.setraw(slave)
+    os.set_blocking(master, False)
+    return master, slave, os.ttyname(slave)
+
+async def serve(session, port, conn):
+    loop = asyncio.get_running_loop()
+    server = ReplayServer(session)
+    runner = web.AppRunner(server.build_app(), access_log=None)
+    await runner.setup()
+    await web.TCPSite(runner, '127.0.0.1', port).start()
+
+    devices = {'mcu': MCUSimulator(), 'lcd': LCDSimulator()}
+    ptys = {name: open_pty() for name in devices}
+
+    def pump(name):
+        master = ptys[name][0]
+        try:
+            data = os.read(master, 65536)
+        except BlockingIOError:
+            return
+        reply = devices[name].feed(data)
+        if reply:
+            os.set_blocking(master, True)
+            os.write(master, reply)
+            os.set_blocking(master, False)
+
+    for name, (master, _, _) in ptys.items():
+        loop.add_reader(master, pump, name)
+
+    stopped = asyncio.Event()
+    loop.add_reader(conn.fileno(), stopped.set)
+    conn.send({'mcu': ptys['mcu'][2], 'lcd': ptys['lcd'][2], 'url': f"http://127.0.0.1:{port}"})
+    await stopped.wait()
+    conn.recv()
+
+    conn.send({'requests': server.requests, 'mcu_commands': devices['mcu'].commands,
+               'display_frames': devices['lcd'].frames, 'display_bytes': devices['lcd'].bytes})
+    await runner.cleanup()
+
+def run(session, port, conn):
+    asyncio.run(serve(session, port, conn))
+
+class Peers:
+    # Forked (not spawned): the child reuses the parent's already installed fake modules
+    def __init__(self, session, port):
+        self.conn, child_conn = multiprocessing.Pipe()
+        self.process = multiprocessing.get_context('fork').Process(target=run, args=(session, port, child_conn), daemon=True)
+        self.process.start()
+        if not self.conn.poll(10):
+            raise RuntimeError("Replay peers did not start")
+        ports = self.conn.recv()
+        self.mcu_port, self.lcd_port, self.url = ports['mcu'], ports['lcd'], ports['url']
+
+    def stop(self):
+        self.conn.send('stop')
+        stats = self.conn.recv() if self.conn.poll(5) else {}
+        self.process.join(5)
+        return stats
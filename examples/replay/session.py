@@ -0,0 +1,86 @@
+import json
+import numpy as np
+import os
+import wave
+
+# A recorded session is a directory with session.json and the audio it names:
+#
+#   {
+#     "wake_after": 6.0,
+#     "turns": [
+#       {"question": "question1.wav", "text": "今日は何曜日？", "reply": "今日は月曜日です。", "reply_audio": "reply1.wav",
+#        "reply_stream": "reply1.sse"}
+#     ],
+#     "latency": {"stt": 0.6, "first_token": 0.5, "token_interval": 0.03, "tts": 0.4, "tts_chunk_interval": 0.01}
+#   }
+#
+# question audio is 16 kHz mono 16-bit, as the microphone delivers it. reply_stream is
+# optional: a chat completion SSE body captured from the API, replayed as is instead
+# of one generated from "reply". The last turn's reply ends the conversation.
+
+RATE = 16000
+
+DEFAULT_LATENCY = {
+    "stt": 0.6,               # transcription request to response
+    "first_token": 0.5,       # chat request to the first SSE event
+    "token_interval": 0.03,   # between SSE events
+    "tts": 0.4,               # speech request to the first audio byte
+    "tts_chunk_interval": 0.01,
+}
+
+def read_wav(path):
+    with wave.open(path, 'rb') as wf:
+        if wf.getsampwidth() != 2:
+            raise ValueError(f"{path}: only 16-bit audio is supported")
+        samples = np.frombuffer(wf.readframes(wf.getnframes()), dtype=np.int16)
+        if wf.getnchannels() > 1:
+            samples = samples[::wf.getnchannels()]
+        return samples, wf.getframerate()
+
+def write_wav(path, samples, rate=RATE):
+    with wave.open(path, 'wb') as wf:
+        wf.setnchannels(1)
+        wf.setsampwidth(2)
+        wf.setframerate(rate)
+        wf.writeframes(np.asarray(samples, dtype=np.int16).tobytes())
+
+def synthetic_speech(duration, rate=RATE, seed=0):
+    # Syllable-like bursts of a low voiced tone, well above the calibrated noise floor
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(duration * rate)) / rate
+    envelope = 0.5 + 0.5 * np.sin(2 * np.pi * 4 * t)
+    voice = np.sin(2 * np.pi * 180 * t) + 0.3 * np.sin(2 * np.pi * 360 * t)
+    return (8000 * envelope * voice + rng.normal(0, 300, len(t))).astype(np.int16)
+
+def create_synthetic_session(directory, turns=2):
+    texts = ["今日の天気はどうですか？", "ありがとう、またね。"]
+    replies = ["今日は晴れです。お散歩にぴったりですね。お薬はもう飲みましたか？", "どういたしまして。またお話ししましょう。"]
+    session = {"wake_after": 6.0, "turns": []}
+    for i in range(turns):
+        question, reply_audio = f"question{i + 1}.wav", f"reply{i + 1}.wav"
+        write_wav(os.path.join(directory, question), synthetic_speech(1.5, seed=i))
+        # The reply is spoken at 24 kHz like the speech endpoint returns it
+        write_wav(os.path.join(directory, reply_audio), synthetic_speech(2.5, rate=24000, seed=10 + i) // 4, rate=24000)
+        session["turns"].append({"question": question, "text": texts[i % len(texts)],
+                                 "reply": replies[i % len(replies)], "reply_audio": reply_audio})
+    with open(os.path.join(directory, "session.json"), "w") as f:
+        json.dump(session, f, ensure_ascii=False, indent=2)
+    return directory
+
+def load_session(directory, latency_overrides=None):
+    with open(os.path.join(directory, "session.json")) as f:
+        session = json.load(f)
+
+    session["latency"] = {**DEFAULT_LATENCY, **session.get("latency", {}), **(latency_overrides or {})}
+    session.setdefault("wake_after", 6.0)
+    for turn in session["turns"]:
+        samples, rate = read_wav(os.path.join(directory, turn["question"]))
+        if rate != RATE:
+            raise ValueError(f"{turn['question']}: recorded at {rate} Hz, the microphone runs at {RATE} Hz")
+        turn["question_samples"] = samples
+        with open(os.path.join(directory, turn["reply_audio"]), "rb") as f:
+            turn["reply_audio_bytes"] = f.read()
+        if turn.get("reply_stream"):
+            with open(os.path.join(directory, turn["reply_stream"]), "rb") as f:
+                turn["reply_stream_bytes"] = f.read()
+    return session
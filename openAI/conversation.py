@@ -1,110 +1,325 @@
 from etc.define import *
+from collections import defaultdict
+from etc.histogram import LatencyHistogram
+from etc.tracing import tracer
+from openAI.history import ConversationHistory
+from openAI.policy import OpenAIAPIError, RequestPolicy
+from openAI.sse import SSEDecoder
+from openAI.stt import LocalSTTBackend, RemoteSTTBackend, STTSelector
+from openAI.tts import LocalTTSBackend, join_wav
+from openAI.tts_cache import TTSCache
 from typing import List, Dict, AsyncGenerator
 
 import aiohttp
+import asyncio
 import json
 import os
+import time
 
 class OpenAIClient:
     def __init__(self):
         self.api_key = os.environ["OPENAI_API_KEY"]
-        self.conversation_history: List[Dict[str, str]] = []
         self.max_retries = 3
-        self.retry_delay = 5
+        self.retry_delay = 5 # upper bound of the backoff between retries
+        self.request_policies = {
+            "chat/completions": RequestPolicy(connect_timeout=5, read_timeout=30, total_timeout=90, max_retries=self.max_retries, backoff_max=self.retry_delay),
+            "audio/transcriptions": RequestPolicy(connect_timeout=5, read_timeout=20, total_timeout=30, max_retries=self.max_retries, backoff_max=self.retry_delay, hedge=True),
+            "audio/speech": RequestPolicy(connect_timeout=5, read_timeout=20, total_timeout=60, max_retries=self.max_retries, backoff_max=self.retry_delay),
+        }
+        self.default_policy = RequestPolicy(connect_timeout=5, read_timeout=20, total_timeout=60, max_retries=self.max_retries, backoff_max=self.retry_delay)
+        self.hedge_min_samples = 10
+        self.latency = defaultdict(LatencyHistogram)
+        self.stt = STTSelector(RemoteSTTBackend(self), LocalSTTBackend(LocalSTTModel), self.latency["audio/transcriptions"])
+        self.base_url = "https://api.openai.com/v1"
         self.http_client = None
         self.audio_player = None
+        self.intent_matcher = None
+        self.keepalive_timeout = 60 # keep warmed connections alive across a full recording
+        self.dns_cache_ttl = 600
+        self.tts_model = "tts-1-hd"
+        self.tts_voice = "nova"
+        self.tts_format = "wav"
+        self.tts_cache = TTSCache(TTS_CACHE_DIR)
+        self.local_tts = LocalTTSBackend(OpenJTalkDictionary, OpenJTalkVoice)
+        self.tts_latency_budget = 8.0 # seconds before falling back to local speech synthesis
+        self.prepared_replies: Dict[str, Dict] = {}
+        self.prepared_reply_ttl = 30 * 60
         self.gptContext = {"role": "system", "content": """あなたは役立つアシスタントです。日本語で返答してください。
                         ユーザーが薬を飲んだかどうか一度だけ確認してください。確認後は、他の話題に移ってください。
                         会話が自然に終了したと判断した場合は、返答の最後に '[END_OF_CONVERSATION]' というタグを付けてください。
                         ただし、ユーザーがさらに質問や話題を提供する場合は会話を続けてください。"""}
+        self.history = ConversationHistory(self.gptContext, token_budget=2000)
+        self.summary_task = None
 
     async def initialize(self):
-        self.http_client = aiohttp.ClientSession()
+        connector = aiohttp.TCPConnector(ttl_dns_cache=self.dns_cache_ttl, keepalive_timeout=self.keepalive_timeout)
+        self.http_client = aiohttp.ClientSession(connector=connector)
+
+    async def warm_up(self):
+        # Called as soon as the wake word fires: resolves DNS and opens the TLS
+        # connection while the user is still talking, so the first STT request
+        # reuses a pooled connection. The chat payload prefix is tokenized and the
+        # network RTT for the STT choice probed meanwhile.
+        self.history.build_prefix()
+        self.stt.probe_soon()
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        try:
+            async with self.http_client.head(f"{self.base_url}/models", headers=headers, timeout=aiohttp.ClientTimeout(total=5)) as response:
+                await response.read()
+            logger.info("OpenAI connection warmed up")
+        except Exception as e:
+            logger.warning(f"OpenAI warm-up failed: {e}")
 
     def setAudioPlayer(self, audioPlayer):
         self.audio_player = audioPlayer
 
+    def setIntentMatcher(self, intentMatcher):
+        self.intent_matcher = intentMatcher
+
+    async def warm_intent_replies(self):
+        # Synthesizes the command replies and time fragments once so they are always cache hits
+        base, ext = os.path.splitext(AIOutputAudio)
+        for reply in self.intent_matcher.cacheable_replies():
+            if self.tts_cache.get(reply, self.tts_model, self.tts_voice, self.tts_format):
+                continue
+            try:
+                await self.remote_text_to_speech(reply, f"{base}_intent{ext}")
+            except Exception as e:
+                logger.warning(f"Failed to prepare intent reply '{reply}': {e}")
+
     async def close(self):
+        for endpoint, histogram in self.latency.items():
+            logger.info(f"OpenAI {endpoint} latency: {histogram.summary()}")
+        self.stt.close()
+        self.tts_cache.close()
         if self.http_client:
             await self.http_client.close()
 
-    async def service_openAI(self, endpoint: str, payload: Dict, files: Dict = None) -> AsyncGenerator[bytes, None]:
-        headers = {"Authorization": f"Bearer {self.api_key}"}
-        url = f"https://api.openai.com/v1/{endpoint}"
-
+    def build_request(self, url: str, payload: Dict, files: Dict, headers: Dict, policy: RequestPolicy):
+        timeout = policy.client_timeout()
         if files:
+            # A fresh FormData per attempt; file contents are passed as bytes so retries can resend them
             data = aiohttp.FormData()
             for key, value in payload.items():
                 data.add_field(key, str(value))
             for key, (filename, file) in files.items():
                 data.add_field(key, file, filename=filename)
-            async with self.http_client.post(url, data=data, headers=headers) as response:
-                async for chunk in response.content.iter_chunks():
-                    yield chunk[0]
-        else:
-            async with self.http_client.post(url, json=payload, headers=headers) as response:
-                async for chunk in response.content.iter_chunks():
-                    yield chunk[0]
+            return self.http_client.post(url, data=data, headers=headers, timeout=timeout)
+        return self.http_client.post(url, json=payload, headers=headers, timeout=timeout)
 
-    async def generate_ai_reply(self, new_message: str) -> AsyncGenerator[str, None]:
-        if not self.conversation_history:
-            self.conversation_history = [self.gptContext]
+    async def service_openAI(self, endpoint: str, payload: Dict, files: Dict = None) -> AsyncGenerator[bytes, None]:
+        headers = {"Authorization": f"Bearer {self.api_key}"}
+        url = f"{self.base_url}/{endpoint}"
+        policy = self.request_policies.get(endpoint, self.default_policy)
+
+        for attempt in range(policy.max_retries + 1):
+            started = False
+            request_start = time.monotonic()
+            try:
+                async with self.build_request(url, payload, files, headers, policy) as response:
+                    if response.status != 200:
+                        retry_after = response.headers.get("Retry-After")
+                        raise OpenAIAPIError(endpoint, response.status, await response.text(),
+                                             float(retry_after) if retry_after and retry_after.isdigit() else None)
+                    self.latency[endpoint].record(time.monotonic() - request_start)
+                    # Request sent (uploads included) to response headers
+                    tracer.record(f"http.{endpoint}", request_start, time.monotonic(), attempt=attempt + 1)
 
-        self.conversation_history.append({"role": "user", "content": new_message})
-        payload = {"model": "gpt-4", "messages": self.conversation_history, "temperature": 0.75, "max_tokens": 500, "stream": True}
+                    async for chunk in response.content.iter_chunks():
+                        started = True
+                        yield chunk[0]
+                return
+            except (OpenAIAPIError, aiohttp.ClientConnectionError, aiohttp.ClientPayloadError, asyncio.TimeoutError) as e:
+                if not started:
+                    # Slow failures count too, or the p95 behind the hedge delay only sees successes
+                    self.latency[endpoint].record(time.monotonic() - request_start)
+                    tracer.record(f"http.{endpoint}", request_start, time.monotonic(), attempt=attempt + 1, error=type(e).__name__)
+                # Once bytes have been handed to the caller the request cannot be replayed
+                retryable = not isinstance(e, OpenAIAPIError) or e.retryable
+                if started or not retryable or attempt >= policy.max_retries:
+                    raise
+                delay = policy.backoff_delay(attempt, getattr(e, 'retry_after', None))
+                logger.warning(f"OpenAI {endpoint} attempt {attempt + 1} failed ({e!r}), retrying in {delay:.2f}s")
+                await asyncio.sleep(delay)
 
-        ai_response_text = ""
-        response_buffer = ""
+    async def fetch_openAI(self, endpoint: str, payload: Dict, files: Dict = None) -> bytes:
+        chunks = []
+        async for chunk in self.service_openAI(endpoint, payload, files):
+            chunks.append(chunk)
+        return b"".join(chunks)
+
+    async def hedged_fetch_openAI(self, endpoint: str, payload: Dict, files: Dict = None) -> bytes:
+        # Sends a second identical request if the first has not answered within the
+        # endpoint's observed p95 latency, and keeps whichever finishes first.
+        policy = self.request_policies.get(endpoint, self.default_policy)
+        histogram = self.latency[endpoint]
+        hedge_delay = histogram.percentile(95) if len(histogram.samples) >= self.hedge_min_samples else None
+        if not policy.hedge or hedge_delay is None:
+            return await self.fetch_openAI(endpoint, payload, files)
+
+        primary = asyncio.create_task(self.fetch_openAI(endpoint, payload, files))
+        tasks = [primary]
+        try:
+            done, _ = await asyncio.wait(tasks, timeout=hedge_delay)
+            if done:
+                return primary.result()
+
+            logger.info(f"OpenAI {endpoint} slower than p95 ({hedge_delay:.2f}s), sending hedged request")
+            tasks.append(asyncio.create_task(self.fetch_openAI(endpoint, payload, files)))
+            pending = set(tasks)
+            error = None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+            raise error
+        finally:
+            # Also when the caller is cancelled: no request outlives the call
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def stream_chat(self, messages: List[Dict[str, str]], max_tokens: int = 500) -> AsyncGenerator[str, None]:
+        payload = {"model": "gpt-4", "messages": messages, "temperature": 0.75, "max_tokens": max_tokens, "stream": True}
+
+        decoder = SSEDecoder()
 
         async for chunk in self.service_openAI("chat/completions", payload):
-            response_buffer += chunk.decode('utf-8')
-            while True:
+            for event in decoder.feed(chunk):
+                if event.data == "[DONE]":
+                    return
                 try:
-                    split_index = response_buffer.index('\n\n')
-                    line = response_buffer[:split_index].strip()
-                    response_buffer = response_buffer[split_index + 2:]
-                    
-                    if line.startswith("data: "):
-                        if line == "data: [DONE]":
-                            break
-                        json_str = line[6:] 
-                        chunk_data = json.loads(json_str)
-                        content = chunk_data['choices'][0]['delta'].get('content', '')
-                        if content:
-                            ai_response_text += content
-                            yield content
-                except ValueError:  
-                    break
+                    chunk_data = json.loads(event.data)
                 except json.JSONDecodeError as e:
                     logger.error(f"JSON decode error: {e}")
-                    logger.error(f"Problematic JSON string: {json_str}")
-                    break
+                    logger.error(f"Problematic JSON string: {event.data}")
+                    continue
+                choices = chunk_data.get('choices')
+                if not choices:
+                    continue
+                content = choices[0].get('delta', {}).get('content')
+                if content:
+                    yield content
 
-        self.conversation_history.append({"role": "assistant", "content": ai_response_text})
+    async def generate_ai_reply(self, new_message: str) -> AsyncGenerator[str, None]:
+        self.history.append("user", new_message)
+        messages = self.history.build_messages()
+        logger.info(f"Prompt size: {self.history.last_prompt_tokens} tokens in {len(messages)} messages")
+
+        response_parts = []
+        async for content in self.stream_chat(messages):
+            response_parts.append(content)
+            yield content
+
+        self.history.append("assistant", "".join(response_parts))
 
-        if len(self.conversation_history) > 11:
-            self.conversation_history = self.conversation_history[:1] + self.conversation_history[-10:]
+    async def collect_ai_reply(self, new_message: str) -> str:
+        start = time.perf_counter()
+        response_parts = []
+        async for response_chunk in self.generate_ai_reply(new_message):
+            if not response_parts:
+                tracer.record("llm.first_token", start)
+            response_parts.append(response_chunk)
+        tracer.record("llm.last_token", start, chunks=len(response_parts))
+        return "".join(response_parts)
+
+    def schedule_history_summary(self):
+        # Folds evicted turns into the rolling summary; called after playback so
+        # the extra chat request never delays a reply.
+        if not self.history.has_evicted_messages():
+            return
+        if self.summary_task is not None and not self.summary_task.done():
+            return
+        self.summary_task = asyncio.create_task(self.summarize_history())
+
+    async def summarize_history(self):
+        folded_count = len(self.history.evicted_messages)
+        try:
+            summary_parts = []
+            async for content in self.stream_chat(self.history.summary_request(), max_tokens=200):
+                summary_parts.append(content)
+            self.history.apply_summary("".join(summary_parts), folded_count)
+            logger.info(f"Conversation summary updated: {self.history.summary}")
+        except Exception as e:
+            logger.error(f"Error summarizing conversation history: {e}")
 
     async def speech_to_text(self, audio_file_path: str) -> str:
+        return await self.stt.transcribe(audio_file_path)
+
+    async def remote_speech_to_text(self, audio_file_path: str) -> str:
         with open(audio_file_path, "rb") as audio_file:
-            files = {"file": ("audio.wav", audio_file)}
-            payload = {"model": "whisper-1", "response_format": "text", "language": "ja"}
-            response_text = ""
-            
-            async for chunk in self.service_openAI("audio/transcriptions", payload, files):
-                transcript_chunk = chunk.decode('utf-8')
-                response_text += transcript_chunk
-
-            return response_text
-
-    async def text_to_speech(self, text: str, output_file: str):
-        payload = {"model": "tts-1-hd", "voice": "nova", "input": text, "response_format": "wav"}
+            audio_data = audio_file.read()
+
+        files = {"file": ("audio.wav", audio_data)}
+        payload = {"model": "whisper-1", "response_format": "text", "language": "ja"}
+
+        # Decode once at the end so multibyte characters split across chunks survive
+        response = await self.hedged_fetch_openAI("audio/transcriptions", payload, files)
+        return response.decode('utf-8')
+
+    async def text_to_speech(self, text: str, output_file: str) -> str:
+        # Returns the file to play: the cached audio on a hit, the remote speech when
+        # it arrives within the latency budget, otherwise local speech
+        cached_file = self.tts_cache.get(text, self.tts_model, self.tts_voice, self.tts_format)
+        if cached_file:
+            return cached_file
+
+        if not self.local_tts.available():
+            return await self.remote_text_to_speech(text, output_file)
+
+        try:
+            return await asyncio.wait_for(self.remote_text_to_speech(text, output_file), timeout=self.tts_latency_budget)
+        except Exception as e:
+            logger.warning(f"Remote TTS failed or exceeded {self.tts_latency_budget}s ({e!r}), using local TTS")
+
+        # Local speech is cached under its own engine and voice, so it is reused on
+        # the next offline turn and replaced once the remote voice is available
+        local_key = self.local_tts_cache_key()
+        cached_file = self.tts_cache.get(text, *local_key)
+        if cached_file:
+            return cached_file
+
+        base, ext = os.path.splitext(output_file)
+        with tracer.span("tts.local"):
+            local_file = await self.local_tts.text_to_speech(text, f"{base}_local{ext}")
+        return self.tts_cache.put(text, *local_key, local_file) or local_file
+
+    def local_tts_cache_key(self):
+        # (model, voice, format) of open_jtalk output in the TTS cache
+        return self.local_tts.name, os.path.basename(self.local_tts.voice_path), "wav"
+
+    async def intent_speech(self, reply, output_file: str) -> str:
+        # A reply in fragments is joined from the cached fragment audio; if the
+        # fragments don't share a format (one came from local TTS) it is synthesized whole
+        if isinstance(reply, str):
+            return await self.text_to_speech(reply, output_file)
+
+        base, ext = os.path.splitext(output_file)
+        parts = [await self.text_to_speech(fragment, f"{base}_part{index}{ext}") for index, fragment in enumerate(reply)]
+        joined = await asyncio.to_thread(join_wav, parts, output_file)
+        return joined or await self.text_to_speech("".join(reply), output_file)
+
+    async def remote_text_to_speech(self, text: str, output_file: str) -> str:
+        payload = {"model": self.tts_model, "voice": self.tts_voice, "input": text, "response_format": self.tts_format}
         
+        start = time.perf_counter()
+        size = 0
         with open(output_file, "wb") as f:
             async for chunk in self.service_openAI("audio/speech", payload):
+                if not size:
+                    tracer.record("tts.first_byte", start)
                 f.write(chunk)
+                size += len(chunk)
+        tracer.record("tts.last_byte", start, bytes=size)
 
         logger.info(f'Audio content written to file "{output_file}"')
+        self.tts_cache.put(text, self.tts_model, self.tts_voice, self.tts_format, output_file)
+        if self.local_tts.available():
+            # The remote voice supersedes a local fallback kept for the same text
+            self.tts_cache.discard(text, *self.local_tts_cache_key())
+        return output_file
 
     async def process_audio(self, input_audio_file: str) -> tuple[str, bool]:
         try:
@@ -112,13 +327,20 @@ class OpenAIClient:
             output_audio_file = f"{base}_response{ext}"
 
             # Transcribe audio (STT)
-            response_text = await self.speech_to_text(input_audio_file)
+            with tracer.span("stt") as span:
+                response_text = await self.speech_to_text(input_audio_file)
+                span["chars"] = len(response_text)
             logger.info(f"Result from stt: {response_text}")
 
+            # Device commands are answered locally without the chat round trip
+            intent_reply = self.intent_matcher.match(response_text) if self.intent_matcher else None
+            if intent_reply:
+                speech_file = await self.intent_speech(intent_reply, output_audio_file)
+                await asyncio.to_thread(self.audio_player.sync_audio_and_gif, speech_file, SpeakingGif)
+                return False
+
             # Generate response (Chat)
-            ai_response_text = ""
-            async for response_chunk in self.generate_ai_reply(response_text):
-                ai_response_text += response_chunk
+            ai_response_text = await self.collect_ai_reply(response_text)
 
             conversation_ended = '[END_OF_CONVERSATION]' in ai_response_text
             ai_response_text = ai_response_text.replace('[END_OF_CONVERSATION]', '').strip()
@@ -127,23 +349,56 @@ class OpenAIClient:
             logger.info(f"Conversation ended: {conversation_ended}")
 
             # Generate speech (TTS)
-            await self.text_to_speech(ai_response_text, output_audio_file)
+            speech_file = await self.text_to_speech(ai_response_text, output_audio_file)
 
-            # await asyncio.to_thread(self.audio_player.sync_audio_and_gif, output_audio_file, SpeakingGif)
-            self.audio_player.sync_audio_and_gif(output_audio_file, SpeakingGif)
+            await asyncio.to_thread(self.audio_player.sync_audio_and_gif, speech_file, SpeakingGif)
+            self.schedule_history_summary()
             return conversation_ended
 
         except Exception as e:
             logger.error(f"Error in process_audio: {e}")
-            self.audio_player.sync_audio_and_gif(ErrorAudio, SpeakingGif)
+            await asyncio.to_thread(self.audio_player.sync_audio_and_gif, ErrorAudio, SpeakingGif)
             return True
         
+    async def prepare_text(self, auto_text: str):
+        # Generates and synthesizes the reply to auto_text ahead of time without
+        # touching the conversation history; process_text picks it up later.
+        try:
+            messages = self.history.build_messages(extra={"role": "user", "content": auto_text})
+
+            response_parts = []
+            async for response_chunk in self.stream_chat(messages):
+                response_parts.append(response_chunk)
+            ai_response_text = "".join(response_parts)
+
+            base, ext = os.path.splitext(AIOutputAudio)
+            prepared_audio_file = f"{base}_prepared{ext}"
+            spoken_text = ai_response_text.replace('[END_OF_CONVERSATION]', '').strip()
+            await self.text_to_speech(spoken_text, prepared_audio_file)
+
+            self.prepared_replies[auto_text] = {"reply": ai_response_text, "created": time.time()}
+            logger.info(f"Prepared reply for '{auto_text}': {spoken_text}")
+        except Exception as e:
+            logger.error(f"Error in prepare_text: {e}")
+
+    def take_prepared_reply(self, auto_text: str):
+        prepared = self.prepared_replies.pop(auto_text, None)
+        if prepared is None:
+            return None
+        if time.time() - prepared["created"] > self.prepared_reply_ttl:
+            logger.info(f"Prepared reply for '{auto_text}' expired")
+            return None
+        return prepared["reply"]
+
     async def process_text(self, auto_text: str) -> tuple[str, bool]:
         try:
-            # Generate response (Chat)
-            ai_response_text = ""
-            async for response_chunk in self.generate_ai_reply(auto_text):
-                ai_response_text += response_chunk
+            # Generate response (Chat), using the pre-generated reply when there is one
+            ai_response_text = self.take_prepared_reply(auto_text)
+            if ai_response_text is not None:
+                self.history.append("user", auto_text)
+                self.history.append("assistant", ai_response_text)
+            else:
+                ai_response_text = await self.collect_ai_reply(auto_text)
 
             conversation_ended = '[END_OF_CONVERSATION]' in ai_response_text
             ai_response_text = ai_response_text.replace('[END_OF_CONVERSATION]', '').strip()
@@ -151,15 +406,15 @@ class OpenAIClient:
             logger.info(f"AI response: {ai_response_text}")
             logger.info(f"Conversation ended: {conversation_ended}")
 
-            # Generate speech (TTS)
+            # Generate speech (TTS), a cache hit when the reply was prepared
             output_audio_file = AIOutputAudio
-            await self.text_to_speech(ai_response_text, output_audio_file)
+            speech_file = await self.text_to_speech(ai_response_text, output_audio_file)
 
-            # await asyncio.to_thread(self.audio_player.sync_audio_and_gif, output_audio_file, SpeakingGif)
-            self.audio_player.sync_audio_and_gif(output_audio_file, SpeakingGif)
+            await asyncio.to_thread(self.audio_player.sync_audio_and_gif, speech_file, SpeakingGif)
+            self.schedule_history_summary()
             return conversation_ended, output_audio_file
 
         except Exception as e:
             logger.error(f"Error in process_audio: {e}")
-            self.audio_player.sync_audio_and_gif(ErrorAudio, SpeakingGif)
+            await asyncio.to_thread(self.audio_player.sync_audio_and_gif, ErrorAudio, SpeakingGif)
             return True, ErrorAudio
\ No newline at end of file
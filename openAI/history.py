@@ -0,0 +1,93 @@
+from etc.define import logger
+from typing import List, Dict, Optional
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+class ConversationHistory:
+    def __init__(self, system_message: Dict[str, str], token_budget: int = 2000, min_recent_messages: int = 2, model: str = "gpt-4"):
+        self.system_message = system_message
+        self.token_budget = token_budget
+        self.min_recent_messages = min_recent_messages
+        self.messages: List[Dict[str, str]] = []
+        self.message_tokens: List[int] = []
+        self.evicted_messages: List[Dict[str, str]] = [] # waiting to be folded into the summary
+        self.summary = ""
+        self.last_prompt_tokens = 0
+        self.prefix = None # (messages, tokens) of the system and summary messages, until the summary changes
+        self.encoder = self.load_encoder(model)
+
+    def load_encoder(self, model):
+        if tiktoken is None:
+            logger.warning("tiktoken is not installed. Estimating token counts from character counts.")
+            return None
+        try:
+            return tiktoken.encoding_for_model(model)
+        except Exception as e:
+            logger.warning(f"Failed to load tokenizer for {model}, estimating token counts: {e}")
+            return None
+
+    def count_tokens(self, text: str) -> int:
+        if self.encoder is not None:
+            return len(self.encoder.encode(text))
+        # Rough estimate: about one token per Japanese character, four ASCII characters per token
+        ascii_chars = sum(1 for c in text if ord(c) < 128)
+        return (len(text) - ascii_chars) + (ascii_chars + 3) // 4
+
+    def count_message_tokens(self, message: Dict[str, str]) -> int:
+        # Every message carries a few tokens of role/formatting overhead
+        return self.count_tokens(message["content"]) + 4
+
+    def append(self, role: str, content: str):
+        message = {"role": role, "content": content}
+        self.messages.append(message)
+        self.message_tokens.append(self.count_message_tokens(message))
+
+    def summary_message(self) -> Optional[Dict[str, str]]:
+        if not self.summary:
+            return None
+        return {"role": "system", "content": f"これまでの会話の要約: {self.summary}"}
+
+    def build_prefix(self):
+        # The system prompt is the bulk of every payload and rarely changes, so it is
+        # tokenized once (at wake word time, see OpenAIClient.warm_up) and reused
+        if self.prefix is None:
+            prefix = [self.system_message]
+            summary_message = self.summary_message()
+            if summary_message:
+                prefix.append(summary_message)
+            self.prefix = (prefix, sum(self.count_message_tokens(m) for m in prefix))
+        return self.prefix
+
+    def build_messages(self, extra: Optional[Dict[str, str]] = None) -> List[Dict[str, str]]:
+        prefix, prefix_tokens = self.build_prefix()
+        extra_tokens = self.count_message_tokens(extra) if extra else 0
+        prefix_tokens += extra_tokens
+
+        # Evict the oldest turns until the payload fits, always keeping the latest exchange
+        while (len(self.messages) > self.min_recent_messages
+               and prefix_tokens + sum(self.message_tokens) > self.token_budget):
+            self.evicted_messages.append(self.messages.pop(0))
+            self.message_tokens.pop(0)
+
+        messages = prefix + self.messages + ([extra] if extra else [])
+        self.last_prompt_tokens = prefix_tokens + sum(self.message_tokens)
+        return messages
+
+    def has_evicted_messages(self) -> bool:
+        return bool(self.evicted_messages)
+
+    def summary_request(self) -> List[Dict[str, str]]:
+        transcript = "\n".join(f"{m['role']}: {m['content']}" for m in self.evicted_messages)
+        previous = self.summary or "なし"
+        return [
+            {"role": "system", "content": "あなたは会話を要約するアシスタントです。今後の応答に必要な事実（服薬確認の結果、ユーザーの話題や希望など）を残し、日本語で簡潔に要約してください。"},
+            {"role": "user", "content": f"これまでの要約: {previous}\n\n追加の会話:\n{transcript}"}
+        ]
+
+    def apply_summary(self, summary: str, folded_count: int):
+        self.summary = summary.strip()
+        self.prefix = None
+        del self.evicted_messages[:folded_count]
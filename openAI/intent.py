@@ -0,0 +1,94 @@
+from etc.define import logger
+
+import datetime
+import re
+import unicodedata
+
+# Intents are whole short commands in the imperative ("音量を上げて"), matched
+# against the full normalized transcript. Anything longer, or anything phrased
+# as a question ("薬は何時に飲めばいい？"), goes to the chat as usual.
+DEGREE = r'(もう少し|もうちょっと|少し|ちょっと)?'
+POLITE = r'(ください|くれる|くれ|ちょうだい)?'
+VOLUME = r'(音量|ボリューム|声)(を|は)?'
+SCREEN = r'(明るさ|輝度|画面)(を|は)?'
+QUESTION_ENDINGS = ('か', 'かな', 'の', 'いい', 'でしょう', 'だろう')
+
+def command(subject, verbs):
+    return re.compile(rf'{DEGREE}{subject}{DEGREE}({verbs}){POLITE}')
+
+class IntentMatcher:
+    # On-device matcher for simple device commands, checked on the transcript
+    # before the chat request. A match is handled locally and answered with a
+    # short fixed reply that the TTS cache already holds. Replies that change
+    # (the time) are a list of fragments spoken back to back, each of them one of
+    # the cacheable_replies, so they are cache hits too.
+    def __init__(self, audio_player, serial_module, step=0.1, max_length=20):
+        self.audio_player = audio_player
+        self.serial_module = serial_module
+        self.step = step
+        self.max_length = max_length
+        self.intents = [
+            (command(VOLUME, r'上げて|あげて|大きくして'), self.volume_up),
+            (command(VOLUME, r'下げて|さげて|小さくして'), self.volume_down),
+            (command(SCREEN, r'上げて|あげて|明るくして'), self.brightness_up),
+            (command(SCREEN, r'下げて|さげて|暗くして'), self.brightness_down),
+            (re.compile(rf'(今の)?(時間|時刻)(を)?教えて{POLITE}'), self.tell_time),
+        ]
+        self.fixed_replies = [
+            "音量を上げました。", "音量を下げました。", "画面を明るくしました。", "画面を暗くしました。",
+        ]
+
+    @staticmethod
+    def normalize(transcript):
+        text = unicodedata.normalize('NFKC', transcript)
+        return re.sub(r'[\s、。!?！？「」]', '', text)
+
+    @staticmethod
+    def is_question(transcript):
+        text = unicodedata.normalize('NFKC', transcript).strip()
+        return '?' in text or IntentMatcher.normalize(text).endswith(QUESTION_ENDINGS)
+
+    def match(self, transcript):
+        if self.is_question(transcript):
+            return None
+        text = self.normalize(transcript)
+        if not text or len(text) > self.max_length:
+            return None
+        for pattern, handler in self.intents:
+            if pattern.fullmatch(text):
+                reply = handler()
+                logger.info(f"Local intent {handler.__name__} matched: {''.join(reply)}")
+                return reply
+        return None
+
+    def volume_up(self):
+        self.audio_player.set_audio_volume(self.audio_player.current_volume + self.step)
+        return self.fixed_replies[0]
+
+    def volume_down(self):
+        self.audio_player.set_audio_volume(self.audio_player.current_volume - self.step)
+        return self.fixed_replies[1]
+
+    def brightness_up(self):
+        self.serial_module.set_brightness(self.serial_module.current_brightness + self.step)
+        return self.fixed_replies[2]
+
+    def brightness_down(self):
+        self.serial_module.set_brightness(self.serial_module.current_brightness - self.step)
+        return self.fixed_replies[3]
+
+    @staticmethod
+    def hour_fragment(hour):
+        return f"今は{hour}時"
+
+    @staticmethod
+    def minute_fragment(minute):
+        return f"{minute}分です。"
+
+    def cacheable_replies(self):
+        return (self.fixed_replies + [self.hour_fragment(hour) for hour in range(24)]
+                + [self.minute_fragment(minute) for minute in range(60)])
+
+    def tell_time(self):
+        now = datetime.datetime.now()
+        return [self.hour_fragment(now.hour), self.minute_fragment(now.minute)]
@@ -0,0 +1,38 @@
+from typing import Optional
+
+import aiohttp
+import random
+
+RETRYABLE_STATUS = {408, 409, 429, 500, 502, 503, 504}
+
+class OpenAIAPIError(Exception):
+    def __init__(self, endpoint: str, status: int, body: str, retry_after: Optional[float] = None):
+        super().__init__(f"{endpoint} returned HTTP {status}: {body[:200]}")
+        self.endpoint = endpoint
+        self.status = status
+        self.body = body
+        self.retry_after = retry_after
+
+    @property
+    def retryable(self) -> bool:
+        return self.status in RETRYABLE_STATUS
+
+class RequestPolicy:
+    def __init__(self, connect_timeout: float, read_timeout: float, total_timeout: float,
+                 max_retries: int = 3, backoff_base: float = 0.5, backoff_max: float = 5.0, hedge: bool = False):
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.total_timeout = total_timeout
+        self.max_retries = max_retries
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.hedge = hedge
+
+    def client_timeout(self) -> aiohttp.ClientTimeout:
+        return aiohttp.ClientTimeout(total=self.total_timeout, sock_connect=self.connect_timeout, sock_read=self.read_timeout)
+
+    def backoff_delay(self, attempt: int, retry_after: Optional[float] = None) -> float:
+        if retry_after is not None:
+            return min(retry_after, self.backoff_max)
+        # Full jitter exponential backoff
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
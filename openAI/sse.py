@@ -0,0 +1,78 @@
+from typing import List, NamedTuple, Optional
+
+class SSEEvent(NamedTuple):
+    event: str
+    data: str
+    id: Optional[str]
+
+class SSEDecoder:
+    # Incremental Server-Sent Events decoder. Only complete lines are decoded, so a
+    # multibyte UTF-8 character split across network chunks is never decoded
+    # half-way, and the cursor keeps a long partial line from being rescanned.
+    def __init__(self):
+        self.buffer = bytearray()
+        self.cursor = 0
+        self.data_lines: List[str] = []
+        self.event_type = ""
+        self.last_event_id: Optional[str] = None
+
+    def feed(self, chunk: bytes) -> List[SSEEvent]:
+        self.buffer += chunk
+        end = self.buffer.rfind(b'\n', self.cursor)
+        if end < 0:
+            self.cursor = len(self.buffer)
+            return []
+
+        # Decode every complete line in one pass and keep only the unterminated tail
+        block = self.buffer[:end].decode('utf-8')
+        del self.buffer[:end + 1]
+        self.cursor = 0
+
+        events = []
+        for line in block.split('\n'):
+            if line.endswith('\r'):
+                line = line[:-1]
+            if line.startswith('data: '):
+                self.data_lines.append(line[6:])
+                continue
+            event = self.process_line(line)
+            if event is not None:
+                events.append(event)
+        return events
+
+    def process_line(self, line: str) -> Optional[SSEEvent]:
+        if not line:
+            return self.dispatch()
+        if line.startswith(':'):
+            return None
+
+        field, _, value = line.partition(':')
+        if value.startswith(' '):
+            value = value[1:]
+
+        if field == 'data':
+            self.data_lines.append(value)
+        elif field == 'event':
+            self.event_type = value
+        elif field == 'id':
+            self.last_event_id = value
+        return None
+
+    def dispatch(self) -> Optional[SSEEvent]:
+        if not self.data_lines:
+            self.event_type = ""
+            return None
+        event = SSEEvent(self.event_type or 'message', "\n".join(self.data_lines), self.last_event_id)
+        self.data_lines = []
+        self.event_type = ""
+        return event
+
+    def close(self) -> List[SSEEvent]:
+        # Flushes an event left without its terminating blank line
+        events = []
+        if self.buffer:
+            events.extend(self.feed(b'\n'))
+        event = self.dispatch()
+        if event is not None:
+            events.append(event)
+        return events
@@ -0,0 +1,160 @@
+from abc import ABC, abstractmethod
+from etc.define import logger
+
+import asyncio
+import importlib.util
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+
+PROJECT_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+class STTBackend(ABC):
+    name = "base"
+
+    def available(self) -> bool:
+        return True
+
+    @abstractmethod
+    async def transcribe(self, audio_file_path: str) -> str:
+        ...
+
+    def close(self):
+        pass
+
+class RemoteSTTBackend(STTBackend):
+    name = "remote"
+
+    def __init__(self, ai_client):
+        self.ai_client = ai_client
+
+    async def transcribe(self, audio_file_path: str) -> str:
+        return await self.ai_client.remote_speech_to_text(audio_file_path)
+
+class LocalSTTBackend(STTBackend):
+    name = "local"
+
+    def __init__(self, model_path: str):
+        self.model_path = model_path
+        self.process = None
+        self.lock = threading.Lock()
+        if self.available():
+            # Its own interpreter running openAI/stt_worker.py as the entry point: nothing
+            # of the app (or its threads) is inherited, and the model loads right away
+            # instead of on the first fallback when the network is slow
+            self.process = subprocess.Popen([sys.executable, "-m", "openAI.stt_worker", model_path], cwd=PROJECT_ROOT,
+                                            stdin=subprocess.PIPE, stdout=subprocess.PIPE, text=True, bufsize=1)
+            logger.info(f"Local STT worker started with model {model_path}")
+        else:
+            logger.info("Local STT is not available (vosk or its model is missing)")
+
+    def available(self) -> bool:
+        return importlib.util.find_spec('vosk') is not None and os.path.isdir(self.model_path)
+
+    def request(self, audio_file_path):
+        # One request line in, one result line out; the lock keeps them paired
+        with self.lock:
+            self.process.stdin.write(json.dumps({"path": audio_file_path}) + "\n")
+            self.process.stdin.flush()
+            line = self.process.stdout.readline()
+        if not line:
+            raise RuntimeError(f"Local STT worker exited with code {self.process.poll()}")
+        result = json.loads(line)
+        if "error" in result:
+            raise RuntimeError(f"Local STT failed: {result['error']}")
+        return result["text"]
+
+    async def transcribe(self, audio_file_path: str) -> str:
+        if self.process is None:
+            raise RuntimeError("Local STT backend is not available")
+        return await asyncio.to_thread(self.request, audio_file_path)
+
+    def close(self):
+        if self.process is not None:
+            self.process.terminate()
+            self.process = None
+
+class STTSelector:
+    # Chooses between the remote and local engine per request: local when the
+    # network is down or slow, remote otherwise, and local again if remote fails.
+    def __init__(self, remote: STTBackend, local: STTBackend, latency_histogram,
+                 rtt_threshold=0.5, remote_latency_budget=6.0, probe_interval=30,
+                 probe_host="api.openai.com", probe_port=443):
+        self.remote = remote
+        self.local = local
+        self.latency_histogram = latency_histogram
+        self.rtt_threshold = rtt_threshold
+        self.remote_latency_budget = remote_latency_budget
+        self.probe_interval = probe_interval
+        self.probe_host = probe_host
+        self.probe_port = probe_port
+        self.last_rtt = None
+        self.last_probe_time = None
+        self.probe_task = None
+
+    def probe_soon(self):
+        # Called from the event loop when a conversation starts and on every
+        # transcription. The RTT is probed in the background, at most once per
+        # probe_interval, so an idle device opens no connections; select() only
+        # reads the latest value.
+        if not self.local.available() or (self.probe_task is not None and not self.probe_task.done()):
+            return
+        if self.last_probe_time is not None and time.monotonic() - self.last_probe_time < self.probe_interval:
+            return
+        self.probe_task = asyncio.create_task(self.probe())
+
+    async def probe(self):
+        self.last_rtt = await self.measure_rtt()
+        self.last_probe_time = time.monotonic()
+        logger.info(f"Network RTT: {'offline' if self.last_rtt is None else f'{self.last_rtt * 1000:.0f} ms'}")
+
+    async def measure_rtt(self):
+        start = time.monotonic()
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(self.probe_host, self.probe_port), timeout=2)
+            writer.close()
+            await writer.wait_closed()
+            return time.monotonic() - start
+        except (OSError, asyncio.TimeoutError):
+            return None
+
+    def mark_network_bad(self):
+        self.last_rtt = None
+        self.last_probe_time = time.monotonic()
+
+    def select(self) -> STTBackend:
+        if not self.local.available():
+            return self.remote
+
+        # Until the first probe has finished the network is assumed to be fine
+        rtt = self.last_rtt
+        if self.last_probe_time is not None and (rtt is None or rtt > self.rtt_threshold):
+            return self.local
+
+        remote_p95 = self.latency_histogram.percentile(95)
+        if remote_p95 is not None and remote_p95 > self.remote_latency_budget:
+            return self.local
+        return self.remote
+
+    async def transcribe(self, audio_file_path: str) -> str:
+        backend = self.select()
+        self.probe_soon()
+        logger.info(f"Using {backend.name} STT")
+        try:
+            return await backend.transcribe(audio_file_path)
+        except Exception as e:
+            if backend is self.local or not self.local.available():
+                raise
+            logger.warning(f"Remote STT failed ({e}), falling back to local STT")
+            self.mark_network_bad()
+            return await self.local.transcribe(audio_file_path)
+
+    def close(self):
+        if self.probe_task is not None:
+            self.probe_task.cancel()
+            self.probe_task = None
+        self.remote.close()
+        self.local.close()
@@ -0,0 +1,43 @@
+# Runs inside the local STT worker process. Kept free of etc.define so the
+# worker does not probe serial ports or need the app environment.
+import json
+import sys
+import wave
+
+model = None
+
+def load_model(model_path):
+    global model
+    from vosk import Model, SetLogLevel
+    SetLogLevel(-1)
+    model = Model(model_path)
+
+def transcribe(audio_file_path):
+    from vosk import KaldiRecognizer
+
+    with wave.open(audio_file_path, 'rb') as wf:
+        recognizer = KaldiRecognizer(model, wf.getframerate())
+        while True:
+            data = wf.readframes(4000)
+            if not data:
+                break
+            recognizer.AcceptWaveform(data)
+
+    text = json.loads(recognizer.FinalResult()).get('text', '')
+    # The Japanese model separates words with spaces
+    return text.replace(' ', '')
+
+def main():
+    # python -m openAI.stt_worker MODEL_PATH: one JSON request per stdin line,
+    # one JSON result per stdout line
+    load_model(sys.argv[1])
+    for line in sys.stdin:
+        try:
+            result = {"text": transcribe(json.loads(line)["path"])}
+        except Exception as e:
+            result = {"error": f"{type(e).__name__}: {e}"}
+        sys.stdout.write(json.dumps(result, ensure_ascii=False) + "\n")
+        sys.stdout.flush()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,63 @@
+from etc.define import logger
+
+import asyncio
+import os
+import shutil
+import wave
+
+def join_wav(files, output_file):
+    """Writes the WAV files back to back into output_file; returns None when their formats differ."""
+    params, frames = None, []
+    for path in files:
+        with wave.open(path, 'rb') as wf:
+            current = (wf.getnchannels(), wf.getsampwidth(), wf.getframerate())
+            if params is not None and current != params:
+                return None
+            params = current
+            frames.append(wf.readframes(wf.getnframes()))
+
+    with wave.open(output_file, 'wb') as wf:
+        wf.setnchannels(params[0])
+        wf.setsampwidth(params[1])
+        wf.setframerate(params[2])
+        wf.writeframes(b''.join(frames))
+    return output_file
+
+class LocalTTSBackend:
+    # Japanese speech synthesis with the Open JTalk command line tool. Each request
+    # runs in its own open_jtalk process; the semaphore bounds how many run at once.
+    name = "open_jtalk"
+
+    def __init__(self, dictionary_dir, voice_path, max_workers=1, speed=1.0):
+        self.dictionary_dir = dictionary_dir
+        self.voice_path = voice_path
+        self.speed = speed
+        self.executable = shutil.which("open_jtalk")
+        self.semaphore = asyncio.Semaphore(max_workers)
+
+        if not self.available():
+            logger.info("Local TTS is not available (open_jtalk, its dictionary or voice is missing)")
+
+    def available(self) -> bool:
+        return self.executable is not None and os.path.isdir(self.dictionary_dir) and os.path.exists(self.voice_path)
+
+    async def text_to_speech(self, text: str, output_file: str) -> str:
+        if not self.available():
+            raise RuntimeError("Local TTS backend is not available")
+
+        async with self.semaphore:
+            process = await asyncio.create_subprocess_exec(
+                self.executable, "-x", self.dictionary_dir, "-m", self.voice_path,
+                "-r", str(self.speed), "-ow", output_file,
+                stdin=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE)
+            try:
+                _, stderr = await process.communicate(text.encode('utf-8'))
+            except asyncio.CancelledError:
+                process.kill()
+                raise
+
+        if process.returncode != 0:
+            raise RuntimeError(f"open_jtalk failed with code {process.returncode}: {stderr.decode(errors='replace')}")
+
+        logger.info(f'Local audio content written to file "{output_file}"')
+        return output_file
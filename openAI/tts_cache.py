@@ -0,0 +1,150 @@
+from collections import OrderedDict
+from etc.define import logger
+
+import hashlib
+import json
+import os
+import re
+import shutil
+import threading
+import time
+import unicodedata
+
+class TTSCache:
+    def __init__(self, cache_dir, max_bytes=50 * 1024 * 1024, flush_interval=60.0):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        # Hits only reorder the LRU, so the index is written at most every flush_interval
+        # seconds for them; put, eviction and close write it right away
+        self.flush_interval = flush_interval
+        self.dirty = False
+        self.last_save = time.monotonic()
+        self.index_file = os.path.join(cache_dir, 'index.json')
+        self.entries = OrderedDict() # key -> {"file", "size"}, least recently used first
+        self.total_bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.lock = threading.Lock()
+
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.load_index()
+
+    @staticmethod
+    def normalize_text(text):
+        text = unicodedata.normalize('NFKC', text)
+        return re.sub(r'\s+', ' ', text).strip()
+
+    def make_key(self, text, model, voice, response_format):
+        material = "\x1f".join([self.normalize_text(text), model, voice, response_format])
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()
+
+    def load_index(self):
+        if not os.path.exists(self.index_file):
+            return
+        try:
+            with open(self.index_file, 'r') as f:
+                saved = json.load(f)
+        except (OSError, ValueError) as e:
+            logger.warning(f"Failed to load TTS cache index, starting empty: {e}")
+            return
+
+        for key, entry in saved:
+            path = os.path.join(self.cache_dir, entry['file'])
+            if os.path.exists(path):
+                self.entries[key] = entry
+                self.total_bytes += entry['size']
+        logger.info(f"TTS cache loaded: {len(self.entries)} entries, {self.total_bytes} bytes")
+
+    def save_index(self):
+        temp_file = f"{self.index_file}.tmp"
+        with open(temp_file, 'w') as f:
+            json.dump(list(self.entries.items()), f)
+        os.replace(temp_file, self.index_file)
+        self.dirty = False
+        self.last_save = time.monotonic()
+
+    def flush(self):
+        with self.lock:
+            if self.dirty:
+                self.save_index()
+
+    def close(self):
+        self.flush()
+
+    def get(self, text, model, voice, response_format):
+        key = self.make_key(text, model, voice, response_format)
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is not None:
+                path = os.path.join(self.cache_dir, entry['file'])
+                if os.path.exists(path):
+                    self.entries.move_to_end(key)
+                    self.hits += 1
+                    self.dirty = True
+                    if time.monotonic() - self.last_save >= self.flush_interval:
+                        self.save_index()
+                    logger.info(f"TTS cache hit ({self.hits} hits / {self.misses} misses)")
+                    return path
+                self.total_bytes -= entry['size']
+                del self.entries[key]
+                self.dirty = True
+
+            self.misses += 1
+            logger.info(f"TTS cache miss ({self.hits} hits / {self.misses} misses)")
+            return None
+
+    def put(self, text, model, voice, response_format, audio_file):
+        key = self.make_key(text, model, voice, response_format)
+        file_name = f"{key}.{response_format}"
+        path = os.path.join(self.cache_dir, file_name)
+        size = os.path.getsize(audio_file)
+        if size == 0 or size > self.max_bytes:
+            return None
+
+        with self.lock:
+            shutil.copyfile(audio_file, f"{path}.tmp")
+            os.replace(f"{path}.tmp", path)
+
+            previous = self.entries.pop(key, None)
+            if previous is not None:
+                self.total_bytes -= previous['size']
+            self.entries[key] = {"file": file_name, "size": size}
+            self.total_bytes += size
+
+            self.evict()
+            self.save_index()
+        return path
+
+    def discard(self, text, model, voice, response_format):
+        key = self.make_key(text, model, voice, response_format)
+        with self.lock:
+            entry = self.entries.pop(key, None)
+            if entry is None:
+                return
+            self.total_bytes -= entry['size']
+            try:
+                os.remove(os.path.join(self.cache_dir, entry['file']))
+            except OSError:
+                pass
+            self.save_index()
+
+    def evict(self):
+        while self.total_bytes > self.max_bytes and self.entries:
+            key, entry = self.entries.popitem(last=False)
+            self.total_bytes -= entry['size']
+            try:
+                os.remove(os.path.join(self.cache_dir, entry['file']))
+            except OSError:
+                pass
+            logger.info(f"Evicted TTS cache entry {key[:8]}")
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+            }
@@ -48,7 +48,8 @@ class RaspberryPiSetup:
 
     def install_system_dependencies(self):
         print("Installing system dependencies...")
-        dependencies = ["python3-dev", "python3-pip", "portaudio19-dev", "libatlas-base-dev", "fonts-ipafont", "fonts-noto-cjk"]
+        dependencies = ["python3-dev", "python3-pip", "portaudio19-dev", "libatlas-base-dev", "fonts-ipafont", "fonts-noto-cjk",
+                        "open-jtalk", "open-jtalk-mecab-naist-jdic", "hts-voice-nitech-jp-atr503-m001"]
         for dep in dependencies:
             if not self.run_command(f"sudo apt-get install -y {dep}"):
                 print(f"Failed to install system dependency: {dep}")
@@ -69,7 +70,9 @@ class RaspberryPiSetup:
             "pvporcupine",
             "aiohttp",
             "scipy",
-            "schedule"
+            "schedule",
+            "tiktoken",
+            "vosk"
         ]
         for package in packages:
             if not self.install_package(package):
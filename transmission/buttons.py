@@ -0,0 +1,122 @@
+from typing import NamedTuple
+
+import queue
+import threading
+import time
+
+# Indexes into the MCU's buttons array
+LEFT = 0
+RIGHT = 1
+DOWN = 2
+UP = 3
+
+PRESS = 'press'
+REPEAT = 'repeat'
+RELEASE = 'release'
+
+class ButtonEvent(NamedTuple):
+    button: int
+    kind: str
+    repeat: int = 0
+
+class ButtonStream:
+    # Turns button states into press/repeat/release events that a screen can wait on.
+    # States come from polling the MCU inside wait(), or from feed() when something
+    # else (a push subscription) delivers them. Held repeat buttons fire after
+    # repeat_delay, then every repeat_interval, shrinking by repeat_acceleration per
+    # repeat down to repeat_min_interval.
+    #
+    # Polling runs at poll_interval while a button is down or just changed, and
+    # backs off by poll_backoff per quiet poll up to idle_poll_interval, so an idle
+    # screen costs a few MCU round trips per second.
+    def __init__(self, read_buttons, poll_interval=0.05, idle_poll_interval=0.25, poll_backoff=1.5, repeat_delay=0.4,
+                 repeat_interval=0.2, repeat_min_interval=0.05, repeat_acceleration=0.8, repeat_buttons=(UP, DOWN)):
+        self.read_buttons = read_buttons
+        self.poll_interval = poll_interval
+        self.idle_poll_interval = idle_poll_interval
+        self.poll_backoff = poll_backoff
+        self.current_poll_interval = poll_interval
+        self.next_poll = 0.0
+        self.repeat_delay = repeat_delay
+        self.repeat_interval = repeat_interval
+        self.repeat_min_interval = repeat_min_interval
+        self.repeat_acceleration = repeat_acceleration
+        self.repeat_buttons = set(repeat_buttons)
+        self.events = queue.Queue()
+        self.lock = threading.Lock()
+        self.state = []
+        self.held = {}
+        self.pushed = False
+
+    def feed(self, buttons, now=None):
+        """Updates the button states; returns True when any button changed."""
+        now = time.monotonic() if now is None else now
+        changed = False
+        with self.lock:
+            for button, pressed in enumerate(buttons):
+                was_pressed = button < len(self.state) and self.state[button]
+                if pressed and not was_pressed:
+                    self.events.put(ButtonEvent(button, PRESS))
+                    if button in self.repeat_buttons:
+                        self.held[button] = [now + self.repeat_delay, 0]
+                    changed = True
+                elif was_pressed and not pressed:
+                    self.held.pop(button, None)
+                    self.events.put(ButtonEvent(button, RELEASE))
+                    changed = True
+            self.state = list(buttons)
+        return changed
+
+    def poll(self, now):
+        # Reads the MCU only when the next poll is due
+        if self.pushed or now < self.next_poll:
+            return
+        buttons = self.read_buttons()
+        if buttons is not None and (self.feed(buttons, now) or any(buttons)):
+            self.current_poll_interval = self.poll_interval
+        else:
+            self.current_poll_interval = min(self.idle_poll_interval, self.current_poll_interval * self.poll_backoff)
+        self.next_poll = now + self.current_poll_interval
+
+    def reset(self):
+        # Buttons already held when a screen opens (e.g. the press that opened it) don't count
+        buttons = self.state if self.pushed else self.read_buttons()
+        with self.lock:
+            self.state = list(buttons or [])
+            self.held.clear()
+            while not self.events.empty():
+                self.events.get_nowait()
+        # A screen that just opened is about to be used
+        self.current_poll_interval = self.poll_interval
+        self.next_poll = time.monotonic() + self.poll_interval
+
+    def emit_repeats(self, now):
+        with self.lock:
+            for button, hold in self.held.items():
+                if now >= hold[0]:
+                    hold[1] += 1
+                    self.events.put(ButtonEvent(button, REPEAT, hold[1]))
+                    hold[0] = now + max(self.repeat_min_interval, self.repeat_interval * self.repeat_acceleration ** hold[1])
+
+    def next_repeat(self):
+        with self.lock:
+            return min((hold[0] for hold in self.held.values()), default=None)
+
+    def wait(self, timeout=None):
+        """Blocks until the next button event; returns None once timeout seconds pass without one."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            now = time.monotonic()
+            self.poll(now)
+            self.emit_repeats(now)
+
+            wake = [t for t in (self.next_repeat(), deadline) if t is not None]
+            if not self.pushed:
+                wake.append(self.next_poll)
+            try:
+                if wake:
+                    return self.events.get(timeout=max(0.0, min(wake) - time.monotonic()))
+                return self.events.get()
+            except queue.Empty:
+                if deadline is not None and time.monotonic() >= deadline:
+                    return None
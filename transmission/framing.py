@@ -0,0 +1,164 @@
+from collections import OrderedDict
+from etc.define import logger
+
+import struct
+import time
+import zlib
+
+# Frame layout (little endian):
+#   magic 2s | version B | type B | sequence H | length I | payload | crc32 I
+# The CRC covers the header and the payload. The display answers every frame
+# with an ACK or NAK frame carrying the same sequence number and no payload.
+MAGIC = b'\xa5\x5a'
+VERSION = 1
+HEADER = struct.Struct('<2sBBHI')
+CRC = struct.Struct('<I')
+
+FRAME_HELLO = 0x01
+FRAME_IMAGE = 0x02
+FRAME_ACK = 0x10
+FRAME_NAK = 0x11
+
+MAX_PAYLOAD = 1 << 20
+
+def pack_frame(frame_type, sequence, payload=b''):
+    header = HEADER.pack(MAGIC, VERSION, frame_type, sequence & 0xFFFF, len(payload))
+    crc = zlib.crc32(payload, zlib.crc32(header))
+    return b''.join((header, payload, CRC.pack(crc)))
+
+class FrameParser:
+    def __init__(self):
+        self.buffer = bytearray()
+
+    def feed(self, data):
+        self.buffer += data
+        frames = []
+        while True:
+            start = self.buffer.find(MAGIC)
+            if start < 0:
+                # Keep a trailing first magic byte that may pair with the next read
+                del self.buffer[:-1 if self.buffer.endswith(MAGIC[:1]) else len(self.buffer)]
+                return frames
+            if start:
+                del self.buffer[:start]
+            if len(self.buffer) < HEADER.size:
+                return frames
+
+            _, version, frame_type, sequence, length = HEADER.unpack_from(self.buffer)
+            if version != VERSION or length > MAX_PAYLOAD:
+                del self.buffer[:1] # not a real header, resynchronise on the next magic
+                continue
+
+            total = HEADER.size + length + CRC.size
+            if len(self.buffer) < total:
+                return frames
+
+            payload = bytes(self.buffer[HEADER.size:HEADER.size + length])
+            (crc,) = CRC.unpack_from(self.buffer, HEADER.size + length)
+            if crc != zlib.crc32(payload, zlib.crc32(bytes(self.buffer[:HEADER.size]))):
+                del self.buffer[:1]
+                continue
+
+            del self.buffer[:total]
+            frames.append((frame_type, sequence, payload))
+
+class FramedLink:
+    # Pipelined sender for the LCD link. Up to `window` frames are in flight;
+    # the host blocks on serial reads (with the port timeout) for ACK/NAK
+    # instead of sleeping and polling in_waiting.
+    def __init__(self, comm, window=3, ack_timeout=1.0, retries=3):
+        self.comm = comm
+        self.window = window
+        self.ack_timeout = ack_timeout
+        self.retries = retries
+        self.parser = FrameParser()
+        self.sequence = 0
+        self.in_flight = OrderedDict() # sequence -> [frame bytes, sent time, attempts]
+        self.frames_acked = 0
+        self.frames_failed = 0
+        self.bytes_acked = 0
+        self.started = time.monotonic()
+
+    def handshake(self, timeout=0.5):
+        self.comm.reset_input_buffer()
+        self.comm.write(pack_frame(FRAME_HELLO, 0))
+        self.comm.flush()
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            for frame_type, sequence, _ in self.parser.feed(self.comm.read(self.comm.in_waiting or 1)):
+                if frame_type == FRAME_ACK and sequence == 0:
+                    self.sequence = 1
+                    return True
+        self.comm.reset_input_buffer()
+        return False
+
+    def next_sequence(self):
+        sequence = self.sequence
+        self.sequence = (self.sequence + 1) & 0xFFFF
+        return sequence
+
+    def send(self, payload, frame_type=FRAME_IMAGE):
+        while len(self.in_flight) >= self.window:
+            self.wait_for_reply()
+
+        sequence = self.next_sequence()
+        frame = pack_frame(frame_type, sequence, payload)
+        self.in_flight[sequence] = [frame, time.monotonic(), 1]
+        self.comm.write(frame)
+        return True
+
+    def flush(self, timeout=5):
+        deadline = time.monotonic() + timeout
+        while self.in_flight and time.monotonic() < deadline:
+            self.wait_for_reply()
+        return not self.in_flight
+
+    def wait_for_reply(self):
+        data = self.comm.read(self.comm.in_waiting or 1) # blocks up to the port timeout
+        for frame_type, sequence, _ in self.parser.feed(data):
+            entry = self.in_flight.get(sequence)
+            if entry is None:
+                continue
+            if frame_type == FRAME_ACK:
+                del self.in_flight[sequence]
+                self.frames_acked += 1
+                self.bytes_acked += len(entry[0])
+            elif frame_type == FRAME_NAK:
+                self.retransmit(sequence, "NAK")
+
+        if self.in_flight:
+            oldest = next(iter(self.in_flight))
+            if time.monotonic() - self.in_flight[oldest][1] > self.ack_timeout:
+                self.retransmit(oldest, "timeout")
+
+    def retransmit(self, sequence, reason):
+        frame, _, attempts = self.in_flight[sequence]
+        latest = (self.sequence - 1) & 0xFFFF
+        if sequence != latest:
+            # A newer frame is already on its way; resending this one would show a stale image
+            del self.in_flight[sequence]
+            self.frames_failed += 1
+            return
+        if attempts >= self.retries:
+            logger.warning(f"Dropping display frame {sequence} after {attempts} attempts ({reason})")
+            del self.in_flight[sequence]
+            self.frames_failed += 1
+            return
+        self.in_flight[sequence] = [frame, time.monotonic(), attempts + 1]
+        self.comm.write(frame)
+
+    def stats(self):
+        elapsed = max(time.monotonic() - self.started, 1e-6)
+        return {
+            'frames_acked': self.frames_acked,
+            'frames_failed': self.frames_failed,
+            'fps': self.frames_acked / elapsed,
+            'bytes_per_sec': self.bytes_acked / elapsed,
+            'in_flight': len(self.in_flight),
+        }
+
+    def reset_stats(self):
+        self.frames_acked = 0
+        self.frames_failed = 0
+        self.bytes_acked = 0
+        self.started = time.monotonic()
@@ -0,0 +1,144 @@
+from etc.define import logger
+from transmission.framing import FrameParser, pack_frame
+
+import json
+import struct
+import threading
+import time
+
+# Binary MCU protocol, carried in the same frames as the LCD link (see framing.py).
+# getInputs is a payload-less request answered with a fixed layout:
+#   buttons B (bit i = buttons[i]) | thermal f | ir_detect B | luminosity f
+# Every other command is the usual JSON message inside a FRAME_JSON frame.
+# After a subscribe command the MCU also pushes FRAME_EVENT frames with the
+# same layout as FRAME_INPUTS: at once on every button edge, and as sensor
+# samples at the subscribed interval.
+#
+# MCU_PROTOCOL_VERSION is what setProtocol negotiates: the message set above.
+# It moves independently of framing.VERSION, which only covers the frame header.
+MCU_PROTOCOL_VERSION = 1
+
+FRAME_GET_INPUTS = 0x20
+FRAME_INPUTS = 0x21
+FRAME_JSON = 0x22
+FRAME_EVENT = 0x23
+
+INPUTS = struct.Struct('<BfBf')
+BUTTON_COUNT = 6
+
+def pack_inputs(buttons, thermal, ir_detect, luminosity):
+    mask = 0
+    for i, pressed in enumerate(buttons):
+        if pressed:
+            mask |= 1 << i
+    return INPUTS.pack(mask, thermal, int(bool(ir_detect)), luminosity)
+
+def unpack_inputs(payload):
+    # Same shape as the JSON getInputs response
+    mask, thermal, ir_detect, luminosity = INPUTS.unpack(payload)
+    return {'result': {
+        'buttons': [bool(mask & (1 << i)) for i in range(BUTTON_COUNT)],
+        'thermal': thermal,
+        'ir_detect': bool(ir_detect),
+        'luminosity': luminosity
+    }}
+
+class BinaryMCULink:
+    def __init__(self, serial_connection, timeout=1.0):
+        self.serial = serial_connection
+        self.timeout = timeout
+        self.parser = FrameParser()
+        self.sequence = 0
+        self.reader = None
+        self.running = False
+        self.on_inputs = None
+        self.pending = {}
+        self.lock = threading.Lock()
+
+    def start_reader(self, on_inputs):
+        # From here on this thread owns reads from the port: replies are handed to the
+        # waiting request by sequence number and pushed inputs go to on_inputs
+        self.on_inputs = on_inputs
+        self.running = True
+        self.reader = threading.Thread(target=self.read_loop, name="MCUReader", daemon=True)
+        self.reader.start()
+
+    def stop(self):
+        self.running = False
+        if self.reader is not None:
+            self.reader.join(timeout=2)
+            self.reader = None
+
+    def read_loop(self):
+        while self.running:
+            try:
+                data = self.serial.read(max(1, self.serial.in_waiting))
+            except Exception as e:
+                logger.error(f"MCU reader stopped: {e}")
+                self.running = False
+                return
+            for frame in self.parser.feed(data) if data else ():
+                self.dispatch(*frame)
+
+    def dispatch(self, frame_type, sequence, payload):
+        if frame_type == FRAME_EVENT:
+            if len(payload) == INPUTS.size:
+                try:
+                    self.on_inputs(unpack_inputs(payload))
+                except Exception as e:
+                    logger.warning(f"MCU input handler failed: {e}")
+            return
+
+        with self.lock:
+            waiter = self.pending.get(sequence)
+        if waiter is not None:
+            waiter[1] = (frame_type, payload)
+            waiter[0].set()
+
+    def request(self, frame_type, payload=b''):
+        self.sequence = (self.sequence + 1) & 0xFFFF
+        sequence = self.sequence
+
+        if self.reader is not None:
+            waiter = [threading.Event(), None]
+            with self.lock:
+                self.pending[sequence] = waiter
+            try:
+                self.serial.write(pack_frame(frame_type, sequence, payload))
+                if waiter[0].wait(self.timeout):
+                    return waiter[1]
+            finally:
+                with self.lock:
+                    self.pending.pop(sequence, None)
+            logger.warning(f"MCU binary request {frame_type:#x} timed out")
+            return None
+
+        self.serial.write(pack_frame(frame_type, sequence, payload))
+
+        deadline = time.monotonic() + self.timeout
+        while time.monotonic() < deadline:
+            data = self.serial.read(max(1, self.serial.in_waiting))
+            if not data:
+                continue
+            for reply_type, reply_sequence, reply_payload in self.parser.feed(data):
+                # Replies to requests that already timed out are skipped
+                if reply_sequence == sequence:
+                    return reply_type, reply_payload
+        logger.warning(f"MCU binary request {frame_type:#x} timed out")
+        return None
+
+    def get_inputs(self):
+        reply = self.request(FRAME_GET_INPUTS)
+        if reply is None or reply[0] != FRAME_INPUTS or len(reply[1]) != INPUTS.size:
+            return None
+        return unpack_inputs(reply[1])
+
+    def command(self, message):
+        reply = self.request(FRAME_JSON, json.dumps(message).encode())
+        if reply is None or reply[0] != FRAME_JSON:
+            return None
+        try:
+            return json.loads(reply[1])
+        except json.JSONDecodeError:
+            logger.error(f"Failed to parse response: {reply[1]!r}")
+            return None
@@ -1,10 +1,18 @@
+from display.compositing import build_lut, ImageCompositor
+from display.worker import DisplayWorker, PRIORITY_HIGH
 from etc.define import BautRate, logger, MCUPort
-from PIL import Image, ImageEnhance
+from etc.tracing import tracer
+from transmission.buttons import ButtonStream
+from transmission.framing import FramedLink
+from transmission.mcu_protocol import BinaryMCULink, MCU_PROTOCOL_VERSION
+from PIL import Image
 
+import asyncio
 import json
 import io
 import numpy as np
 import serial
+import threading
 import time
 
 class SerialModule:
@@ -12,29 +20,131 @@ class SerialModule:
         self.isPortOpen = False
         self.baud_rate = baud_rate
         self.comm = None
+        self.framed_link = None
+        self.display_worker = DisplayWorker(self.write_image_data)
+        self.display_worker.start()
         self.current_brightness = 1.0  
+        self.brightness_changed_at = time.monotonic()
         self.current_image = None
+        self._brightness_lut = None
+        self._brightness_lut_level = None
         self.input_serial = serial.Serial(MCUPort, BautRate, timeout=1)
+        # the MCU link is shared by the wake word loop and the scheduler thread
+        self.mcu_lock = threading.Lock()
+        self.buttons = ButtonStream(self.read_buttons)
+        self.mcu_link = None
+        self.mcu_link = self.negotiate_mcu_protocol()
+        self.subscribed = False
+        self.latest_inputs = None
+        self.input_listeners = []
+        self.backlight_supported = self.probe_backlight()
+
+    def commit_brightness(self, brightness):
+        # Every change of the level goes through here, so auto brightness can tell when it was made
+        self.current_brightness = max(0.0, min(1.0, brightness))
+        self.brightness_changed_at = time.monotonic()
 
     def set_brightness(self, brightness):
-        self.current_brightness = max(0.0, min(1.0, brightness))
+        self.commit_brightness(brightness)
+        if self.backlight_supported:
+            self.set_backlight(self.current_brightness)
+
+    @property
+    def software_brightness(self):
+        # With hardware backlight control frames are rendered at full level
+        return 1.0 if self.backlight_supported else self.current_brightness
+
+    def probe_backlight(self):
+        response = self.send_mcu_command("setBacklight", {"percent": int(round(self.current_brightness * 100))})
+        supported = bool(response and 'result' in response)
+        logger.info(f"Hardware backlight control {'available' if supported else 'not available, using software brightness'}")
+        return supported
+
+    def set_backlight(self, level):
+        # Drives the LCD backlight PWM through the MCU: a few bytes instead of a re-rendered frame
+        level = max(0.0, min(1.0, level))
+        response = self.send_mcu_command("setBacklight", {"percent": int(round(level * 100))})
+        if not response or 'result' not in response:
+            logger.warning(f"setBacklight failed: {response}")
+            return False
+        return True
+
+    def fade_backlight(self, start, end, steps=10, transition_time=0.5):
+        step_time = transition_time / steps
+        for i in range(steps + 1):
+            self.set_backlight(start + (end - start) * i / steps)
+            time.sleep(step_time)
 
     def open(self, tty):
+        if self.display_worker.stopped:
+            # Reopening after close() needs a new owner for the LCD port
+            self.display_worker = DisplayWorker(self.write_image_data)
+            self.display_worker.start()
         try:
             self.comm = serial.Serial(tty, self.baud_rate, timeout=0.1)
             self.isPortOpen = True
             logger.info(f"Port opened successfully at {self.baud_rate} baud")
+            self.display_worker.call(self.negotiate_framing, priority=PRIORITY_HIGH)
         except Exception as e:
             self.isPortOpen = False
             logger.warning(f"Failed to open port: {e}")
         return self.isPortOpen
 
+    def negotiate_framing(self):
+        # Displays with framed firmware answer HELLO with an ACK frame; anything else
+        # keeps the legacy 'test' probe protocol
+        link = FramedLink(self.comm)
+        try:
+            self.framed_link = link if link.handshake() else None
+        except Exception as e:
+            logger.warning(f"Framing handshake failed: {e}")
+            self.framed_link = None
+        logger.info(f"Display link uses {'framed' if self.framed_link else 'legacy'} protocol")
+
+    def negotiate_mcu_protocol(self):
+        # Firmware that knows the binary protocol acknowledges setProtocol; anything else keeps JSON lines
+        response = self.send_mcu_command("setProtocol", {"format": "binary", "version": MCU_PROTOCOL_VERSION})
+        if not (response and 'result' in response):
+            logger.info("MCU link uses the JSON protocol")
+            return None
+
+        with self.mcu_lock:
+            link = BinaryMCULink(self.input_serial)
+            if link.get_inputs() is None:
+                # The firmware has already switched, so it has to be told to go back
+                # before JSON commands are answered again
+                logger.warning("MCU accepted the binary protocol but did not answer in it, reverting to JSON")
+                link.command({"method": "setProtocol", "params": {"format": "json", "version": MCU_PROTOCOL_VERSION}})
+                self.input_serial.reset_input_buffer()
+                response = self._send_mcu_command("getInputs")
+                if not (response and 'result' in response):
+                    logger.error("MCU does not answer in either protocol, buttons and sensors are unavailable")
+                return None
+
+        # A binary poll is cheap enough to check the buttons more often
+        self.buttons.poll_interval = 0.02
+        logger.info("MCU link uses the binary protocol")
+        return link
+
     def send_mcu_command(self, method, params=None):
+        with self.mcu_lock:
+            return self._send_mcu_command(method, params)
+
+    def _send_mcu_command(self, method, params=None):
         serial_connection = self.input_serial  
         
         message = {"method": method}
         if params:
             message["params"] = params
+
+        if self.mcu_link is not None:
+            try:
+                if method == "getInputs":
+                    return self.mcu_link.get_inputs()
+                return self.mcu_link.command(message)
+            except serial.SerialException as e:
+                logger.error(f"Serial communication error: {e}")
+                return None
         
         serial_connection.write(json.dumps(message).encode() + b'\n')
         try:
@@ -56,18 +166,96 @@ class SerialModule:
         self.comm.write(data)
 
     def get_inputs(self):
+        # Once subscribed the MCU keeps latest_inputs current, no round trip needed
+        if self.subscribed and self.latest_inputs is not None:
+            return self.latest_inputs
         return self.send_mcu_command("getInputs")
 
+    def subscribe(self, sensor_interval=1.0):
+        """Switches the MCU to pushing button edges and sensor samples instead of being polled."""
+        if self.mcu_link is None:
+            logger.info("MCU push mode needs the binary protocol, buttons stay polled")
+            return False
+
+        response = self.send_mcu_command("subscribe", {"buttons": True, "sensor_interval_ms": int(sensor_interval * 1000)})
+        if not (response and 'result' in response):
+            logger.info("MCU does not support subscribe, buttons stay polled")
+            return False
+
+        self.mcu_link.start_reader(self.handle_pushed_inputs)
+        self.buttons.pushed = True
+        self.subscribed = True
+        logger.info(f"Subscribed to MCU inputs, sensor samples every {sensor_interval}s")
+        return True
+
+    def handle_pushed_inputs(self, inputs):
+        # Runs on the MCU reader thread
+        self.latest_inputs = inputs
+        self.buttons.feed(inputs['result']['buttons'])
+        for listener in list(self.input_listeners):
+            try:
+                listener(inputs)
+            except Exception as e:
+                logger.warning(f"Input listener failed: {e}")
+
+    def add_input_listener(self, listener):
+        self.input_listeners.append(listener)
+
+    def remove_input_listener(self, listener):
+        if listener in self.input_listeners:
+            self.input_listeners.remove(listener)
+
+    async def input_events(self):
+        # Async iterator over pushed inputs, in the same shape as get_inputs()
+        loop = asyncio.get_running_loop()
+        inputs_queue = asyncio.Queue()
+
+        def listener(inputs):
+            loop.call_soon_threadsafe(inputs_queue.put_nowait, inputs)
+
+        self.add_input_listener(listener)
+        try:
+            while True:
+                yield await inputs_queue.get()
+        finally:
+            self.remove_input_listener(listener)
+
+    def read_buttons(self):
+        inputs = self.get_inputs()
+        if inputs and 'result' in inputs:
+            return inputs['result']['buttons']
+        return None
+
     def send_text(self):
         self.send('test'.encode())
         time.sleep(0.01)
         self.comm.read_all()
 
     def send_image_data(self, img_data, timeout=5, retries=3):
+        # Runs on the display worker, which owns the LCD port
+        return self.display_worker.call(self.write_image_data, img_data, timeout, retries)
+
+    def send_animation_frame(self, img_data):
+        # Non-blocking; replaces any animation frame that has not been sent yet
+        self.display_worker.show_animation_frame(img_data)
+
+    def write_image_data(self, img_data, timeout=5, retries=3):
+        with tracer.span("display.frame", bytes=len(img_data)) as span:
+            span["ok"] = self._write_image_data(img_data, timeout, retries)
+            return span["ok"]
+
+    def _write_image_data(self, img_data, timeout=5, retries=3):
         if not self.isPortOpen or self.comm is None:
             logger.warning("Serial port is not open")
             return False
 
+        if self.framed_link:
+            try:
+                return self.framed_link.send(img_data)
+            except Exception as e:
+                logger.warning(f"Error in send_image_data: {str(e)}")
+                return False
+
         # logger.info(f"Sending image data of size: {len(img_data)} bytes")
         
         for attempt in range(retries):
@@ -76,11 +264,7 @@ class SerialModule:
                 self.send_text()
                 self.comm.read_all()  # Clear any remaining data
                 
-                start_time = time.time()
-                bytes_written = self.comm.write(img_data)
-                write_time = time.time() - start_time
-                # logger.info(f"Bytes written: {bytes_written}, Time taken: {write_time:.2f} seconds")
-                
+                self.comm.write(img_data)
                 self.comm.flush()  # Ensure all data is written
                 
                 # Wait for response with timeout
@@ -107,42 +291,29 @@ class SerialModule:
         logger.warning("Failed to send image data after all retries")
         return False
 
-    def fade_image(self, image_path, fade_in=True, steps=20):
-        img = Image.open(image_path)
-        width, height = img.size
-
-        for i in range(steps):
-            if fade_in:
-                alpha = int(255 * (i + 1) / steps)
-            else:
-                alpha = int(255 * (steps - i) / steps)
-
-            faded_img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-            faded_img.paste(img, (0, 0))
-            faded_img.putalpha(alpha)
-
-            rgb_img = Image.new("RGB", faded_img.size, (0, 0, 0))
-            rgb_img.paste(faded_img, mask=faded_img.split()[3])
-
-            img_byte_arr = io.BytesIO()
-            rgb_img.save(img_byte_arr, format='PNG')
-            img_byte_arr = img_byte_arr.getvalue()
-
-            success = self.send_image_data(img_byte_arr)
-            if not success:
-                logger.warning(f"Failed to send image for step {i+1}, continuing to next step")
-            
-            time.sleep(0.05) 
+    def brightness_lut(self):
+        level = self.software_brightness
+        if self._brightness_lut_level != level:
+            self._brightness_lut = build_lut(level)
+            self._brightness_lut_level = level
+        return self._brightness_lut
 
     def apply_brightness(self, img):
-        enhancer = ImageEnhance.Brightness(img)
-        return enhancer.enhance(self.current_brightness)
+        pixels = np.asarray(img.convert('RGB'), dtype=np.uint8)
+        return Image.fromarray(self.brightness_lut()[pixels])
     
     def send_white_frames(self, flash_delay=0.01, timeout=2):
+        self.display_worker.clear_animation()
+        return self.display_worker.call(self.write_white_frames, flash_delay, timeout, priority=PRIORITY_HIGH)
+
+    def write_white_frames(self, flash_delay=0.01, timeout=2):
         white_frame = np.full((240, 240, 3), 255, dtype=np.uint8)
         white_frame_bytes = self.frame_to_bytes(white_frame)
         # logger.info(f"Prepared white frame, size: {len(white_frame_bytes)} bytes")
 
+        if self.framed_link:
+            return self.write_image_data(white_frame_bytes) and self.framed_link.flush(timeout)
+
         try:
             # logger.info(f"Attempt {attempt + 1}/{max_retries} to send white frame")
             start_time = time.time()
@@ -208,27 +379,24 @@ class SerialModule:
         return [self.frame_to_bytes(frame) for frame in frames]
 
     def fade_image(self, image_path, fade_in=True, steps=20):
-        img = Image.open(image_path)
-        width, height = img.size
+        if self.backlight_supported:
+            start, end = (0.0, self.current_brightness) if fade_in else (self.current_brightness, 0.0)
+            self.set_backlight(start)
+            self.send_image_data(ImageCompositor(image_path).encode(1.0))
+            self.fade_backlight(start, end, steps=steps, transition_time=steps * 0.05)
+            return
+
+        compositor = ImageCompositor(image_path)
 
         for i in range(steps):
             if fade_in:
-                alpha = int(255 * (i + 1) / steps)
+                alpha = (i + 1) / steps
             else:
-                alpha = int(255 * (steps - i) / steps)
-
-            faded_img = Image.new("RGBA", (width, height), (0, 0, 0, 0))
-            faded_img.paste(img, (0, 0))
-            faded_img.putalpha(alpha)
+                alpha = (steps - i) / steps
 
-            rgb_img = Image.new("RGB", faded_img.size, (0, 0, 0))
-            rgb_img.paste(faded_img, mask=faded_img.split()[3])
-
-            img_byte_arr = io.BytesIO()
-            rgb_img.save(img_byte_arr, format='PNG')
-            img_byte_arr = img_byte_arr.getvalue()
-
-            self.send_image_data(img_byte_arr)
+            success = self.send_image_data(compositor.encode(alpha))
+            if not success:
+                logger.warning(f"Failed to send image for step {i+1}, continuing to next step")
             time.sleep(0.001)  
             
     def animate_gif(self, gif_path, frame_delay=0.1):
@@ -250,6 +418,12 @@ class SerialModule:
             logger.error("Serial port is not open")
             return False
 
+        if self.backlight_supported:
+            self.fade_backlight(self.current_brightness, brightness, steps=steps, transition_time=transition_time)
+            self.commit_brightness(brightness)
+            logger.info(f"Backlight adjustment completed. Final brightness: {brightness:.2f}")
+            return True
+
         if self.current_image is None:
             logger.error("No current image to adjust brightness")
             return False
@@ -257,21 +431,12 @@ class SerialModule:
         start_brightness = self.current_brightness
         brightness_step = (brightness - start_brightness) / steps
         step_time = transition_time / steps
+        compositor = ImageCompositor(self.current_image)
 
         for i in range(steps + 1):
             current_step_brightness = start_brightness + brightness_step * i
             try:
-                # Adjust image brightness
-                enhancer = ImageEnhance.Brightness(self.current_image)
-                adjusted_image = enhancer.enhance(current_step_brightness)
-
-                # Convert to bytes
-                img_byte_arr = io.BytesIO()
-                adjusted_image.save(img_byte_arr, format='PNG')
-                img_byte_arr = img_byte_arr.getvalue()
-
-                # Send to display
-                self.send_image_data(img_byte_arr)
+                self.send_image_data(compositor.encode(current_step_brightness))
                 
                 logger.debug(f"Adjusted brightness to {current_step_brightness:.2f}")
                 time.sleep(step_time)
@@ -280,13 +445,28 @@ class SerialModule:
                 logger.error(f"Error adjusting brightness: {str(e)}")
                 return False
 
-        self.current_brightness = brightness
+        self.commit_brightness(brightness)
         logger.info(f"Brightness adjustment completed. Final brightness: {brightness:.2f}")
         return True
 
+    def display_stats(self):
+        return self.framed_link.stats() if self.framed_link else None
+
     def close(self):
+        self.display_worker.call(self.close_display_link, priority=PRIORITY_HIGH, timeout=5)
+        self.display_worker.stop()
+        if self.mcu_link is not None:
+            self.mcu_link.stop()
         if self.isPortOpen and self.comm is not None:
-            self.comm.close()
             self.input_serial.close()
             self.isPortOpen = False
-            logger.info("Serial connection closed")
\ No newline at end of file
+            logger.info("Serial connection closed")
+
+    def close_display_link(self):
+        if self.isPortOpen and self.comm is not None:
+            if self.framed_link:
+                self.framed_link.flush(timeout=1)
+                logger.info(f"Display link stats: {self.framed_link.stats()}")
+                self.framed_link = None
+            self.comm.close()
+        logger.info(f"Display worker sent {self.display_worker.frames_sent} animation frames, dropped {self.display_worker.frames_dropped} stale frames")